@@ -0,0 +1,93 @@
+import sys
+import threading
+from collections import OrderedDict
+
+"""
+LRU cache of model evaluations
+
+Ratings are keyed by the packed canonical position plus the canonical move (see position_key),
+so both players' views of a position share entries.
+Every entry belongs to one version of the model weights: when the model's version changes,
+the whole cache is dropped before the next lookup.
+Memory is capped by an estimate of each entry's size, evicting the least recently used entries first.
+"""
+
+class EvaluationCache:
+    MAX_BYTES = 64 * 1024 * 1024
+    # Rough cost of an OrderedDict slot and its links, on top of the key and value objects
+    ENTRY_OVERHEAD = 100
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bots can be shared between threads, e.g. by the match server's executor
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def entry_size(self, key, value):
+        return sys.getsizeof(key) + sys.getsizeof(value) + self.ENTRY_OVERHEAD
+
+    def check_version(self, version):
+        """
+        Drops every entry if they were computed by a different version of the weights
+        """
+
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.bytes = 0
+            self.version = version
+
+    def get(self, key, version):
+        """
+        Returns the cached rating, or None
+        """
+
+        with self.lock:
+            self.check_version(version)
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, version):
+        with self.lock:
+            self.check_version(version)
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return
+            self.entries[key] = value
+            self.bytes += self.entry_size(key, value)
+            while self.bytes > self.max_bytes and self.entries:
+                old_key, old_value = self.entries.popitem(last=False)
+                self.bytes -= self.entry_size(old_key, old_value)
+                self.evictions += 1
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate(),
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'version': self.version,
+        }
@@ -0,0 +1,14 @@
+import os
+import sys
+
+"""
+Makes the engine modules in ../game importable from the bot modules and scripts
+
+Bot modules import this before any engine module. The directory is only added to sys.path if it is missing,
+so cli.py, which already sets the paths, and repeated imports leave sys.path unchanged.
+"""
+
+GAME_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'game'))
+
+if GAME_DIR not in sys.path:
+    sys.path.append(GAME_DIR)
@@ -0,0 +1,90 @@
+import json
+import time
+import random
+import asyncio
+
+from server import MatchServer, HOST, PORT
+
+"""
+Load generating client for the match server
+
+Opens CONNECTIONS connections, and each one plays GAMES games as a random human against OPPONENT.
+Every request's round trip is timed, and the run reports throughput and latency percentiles.
+With spawn=True the server runs in the same event loop, so a load test needs a single command.
+"""
+
+CONNECTIONS = 200
+GAMES = 5
+OPPONENT = 'random'
+
+
+async def request(reader, writer, message, latencies):
+    start = time.perf_counter()
+    writer.write(json.dumps(message).encode() + b'\n')
+    await writer.drain()
+    response = json.loads(await reader.readline())
+    latencies.append(time.perf_counter() - start)
+    if not response['ok']:
+        raise Exception(response['error'])
+    return response
+
+
+async def play_games(host, port, path, games, opponent, latencies):
+    """
+    One client connection: plays games one after another, picking random moves
+    """
+
+    if path:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    for g in range(games):
+        response = await request(reader, writer, {'op': 'new', 'players': ['human', opponent], 'starting_player': random.choice([1, 2])}, latencies)
+        state = response['state']
+        while not state['over']:
+            response = await request(reader, writer, {'op': 'move', 'session': state['session'], 'choice': random.choice(state['options'])}, latencies)
+            state = response['state']
+        await request(reader, writer, {'op': 'close', 'session': state['session']}, latencies)
+    writer.close()
+    return games
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+async def load_test(host=HOST, port=PORT, path=None, connections=CONNECTIONS, games=GAMES, opponent=OPPONENT, spawn=False):
+    """
+    Runs the load test and returns a dict of results, latencies in milliseconds
+    """
+
+    server = None
+    if spawn:
+        server = MatchServer(host, port, path)
+        await server.start()
+
+    latencies = []
+    start = time.perf_counter()
+    played = await asyncio.gather(*[play_games(host, port, path, games, opponent, latencies) for c in range(connections)])
+    elapsed = time.perf_counter() - start
+    if server:
+        server.close()
+
+    result = {
+        'games': sum(played),
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'p50': 1000 * percentile(latencies, 50),
+        'p90': 1000 * percentile(latencies, 90),
+        'p99': 1000 * percentile(latencies, 99),
+        'max': 1000 * max(latencies),
+    }
+    print(f'{result["games"]} games, {result["requests"]} requests in {elapsed:.2f}s ({result["requests_per_second"]:.0f} req/s)')
+    print(f'Latency ms: p50 {result["p50"]:.2f}  p90 {result["p90"]:.2f}  p99 {result["p99"]:.2f}  max {result["max"]:.2f}')
+    return result
+
+
+if __name__ == '__main__':
+    asyncio.run(load_test(spawn=True))
@@ -1,13 +1,12 @@
 import os
 
 import torch
-import pandas as pd
-import numpy as np
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import DataLoader, WeightedRandomSampler
 from torch import nn, optim
 
-from mancala_dataset import MancalaDataset
-from pipeline import MancalaPipeline
+import game_path
+
+from mancala_helpers import canonical_state, canonical_move, position_key
 
 device = ('cuda' if torch.cuda.is_available() else 'cpu')
 
@@ -41,11 +40,11 @@ class MancalaBotModel(nn.Module):
     Choosing a move:
     The bot rates each possible move, then returns the most highly rated one.
     """
-    def __init__(self):
+    def __init__(self, hidden_neurons=48):
         super().__init__()
         
         self.input_size = 18
-        self.hidden_neurons = 48
+        self.hidden_neurons = hidden_neurons
         self.output_size = 1
 
         self.sigmoid = torch.sigmoid
@@ -53,6 +52,9 @@ class MancalaBotModel(nn.Module):
         self.hidden_layer = nn.Linear(self.input_size, self.hidden_neurons, dtype=torch.float64)
         self.activation = nn.ReLU()
         self.output_layer = nn.Linear(self.hidden_neurons, self.output_size, dtype=torch.float64)
+
+        # Bumped whenever the weights change, so cached evaluations can be invalidated
+        self.version = 0
         
     def forward(self, x):
         
@@ -78,14 +80,33 @@ class MancalaBotModel(nn.Module):
         file_name = os.path.join(folder_path, file_name)
         torch.save(self.state_dict(), file_name)
 
+    def load_state_dict(self, *args, **kwargs):
+        result = super().load_state_dict(*args, **kwargs)
+        self.version += 1
+        return result
+
+    def load(self, file_name='mancala_bot_model_save'):
+        file_name = os.path.join('./model_saves', file_name)
+        self.load_state_dict(torch.load(file_name))
+        self.eval()
+
 class MancalaBot:
     """
     Defines the bot that uses the model
     Will support training as well as single move evaluation
+    If weighted, rows are drawn in proportion to the dataset's sample counts (see PositionIndex)
+    With a cache (see EvaluationCache), moves already rated by the current weights skip the forward pass
     """
-    def __init__(self, data, batch_size, epochs, lr):
-        self.model = MancalaBotModel()
-        self.dataloader = DataLoader(data, batch_size)
+    def __init__(self, data, batch_size, epochs, lr, weighted=False, hidden_neurons=48, cache=None):
+        self.model = MancalaBotModel(hidden_neurons)
+        self.cache = cache
+        if data is None:
+            self.dataloader = None
+        elif weighted and data.counts is not None:
+            sampler = WeightedRandomSampler(data.counts, num_samples=len(data.counts))
+            self.dataloader = DataLoader(data, batch_size, sampler=sampler)
+        else:
+            self.dataloader = DataLoader(data, batch_size)
         self.epochs = epochs
         self.lr = lr
         self.optimizer = optim.Adam(self.model.parameters(), lr=self.lr)
@@ -97,16 +118,18 @@ class MancalaBot:
         loss.backward()
         self.optimizer.step()
         self.optimizer.zero_grad()
+        self.model.version += 1
         return loss
 
-    def train(self, save=False, record_data=False):
+    def train(self, save=False, record_data=False, verbose=True):
         log = []
         for t in range(self.epochs):
             losses = []
             batches = []
             for batch, (X, y) in enumerate(self.dataloader):
                 current_loss = self.train_step(X, y)
-                print(f'Batch: {batch} | Loss: {current_loss.item()}')
+                if verbose:
+                    print(f'Batch: {batch} | Loss: {current_loss.item()}')
                 if record_data:
                     losses.append(current_loss.item())
                     batches.append(batch)
@@ -115,3 +138,40 @@ class MancalaBot:
             self.model.save()
         if record_data:
             return log
+
+    def features(self, board, choice, player):
+        """
+        Returns the input row for a move, in the same canonical layout the pipeline writes
+        The move is previewed on a copy of the board to get its refresh, capture and points
+        """
+
+        refresh, captured, additions, removals = board.copy().sow(choice, player)
+        bowls, bank1, bank2 = canonical_state(board.flatten(), board.bank1().value, board.bank2().value, player)
+        return bowls + [bank1, bank2, canonical_move(choice, player), 1 if refresh else 0, 1 if captured else 0, additions[12] + additions[13]]
+
+    def get_move(self, board, player):
+        """
+        Rates each of player's options on the board and returns the most highly rated one
+        """
+
+        options = board.options(player)
+        if self.cache is None:
+            rows = torch.tensor([self.features(board, choice, player) for choice in options], dtype=torch.float64)
+            with torch.no_grad():
+                ratings = self.model(rows).flatten()
+            return options[int(torch.argmax(ratings))]
+
+        # Only the options missing from the cache are previewed and rated, in one batch
+        version = self.model.version
+        position = position_key(board.flatten(), board.bank1().value, board.bank2().value, player)
+        keys = [position + bytes([canonical_move(choice, player)]) for choice in options]
+        ratings = [self.cache.get(key, version) for key in keys]
+        missing = [i for i, rating in enumerate(ratings) if rating is None]
+        if missing:
+            rows = torch.tensor([self.features(board, options[i], player) for i in missing], dtype=torch.float64)
+            with torch.no_grad():
+                computed = self.model(rows).flatten().tolist()
+            for i, rating in zip(missing, computed):
+                ratings[i] = rating
+                self.cache.put(keys[i], rating, version)
+        return options[max(range(len(options)), key=ratings.__getitem__)]
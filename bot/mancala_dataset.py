@@ -1,16 +1,19 @@
-import os
 import csv
 import torch
 import pandas as pd
-import numpy as np
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset
 
 class MancalaDataset(Dataset):
     """
     Creates a torch dataset from a csv file for the bot to use
+    An optional counts file from an indexed pipeline run gives each row a sampling weight
     """
-    def __init__(self, csv_file, ratings_file):
+    def __init__(self, csv_file, ratings_file, counts_file=None):
         self.data = pd.read_csv(csv_file, header=None)
+        # The pipeline writes every row from the mover's side. Choices 6-11 mean the CSV is from an older pipeline,
+        # whose ratings were computed from raw bowls and can't be fixed by rotating the rows
+        if (self.data[14] >= 6).any():
+            raise ValueError(f'MancalaDataset: {csv_file} was written by an older pipeline, convert the game log again')
         self.data.rename(columns={0: 'bowl1',
                              1: 'bowl2',
                              2: 'bowl3',
@@ -34,6 +37,13 @@ class MancalaDataset(Dataset):
             reader = csv.reader(file)
             for row in reader:
                 self.ratings.append(row[0])
+        self.counts = None
+        if counts_file:
+            self.counts = []
+            with open(counts_file, newline='') as file:
+                reader = csv.reader(file)
+                for row in reader:
+                    self.counts.append(int(row[0]))
 
     def __getitem__(self, idx):
         input_item = torch.tensor(pd.DataFrame.to_numpy(self.data.iloc[[idx]]).flatten()).to(torch.float64)
@@ -43,4 +53,15 @@ class MancalaDataset(Dataset):
     def __len__(self):
         return len(self.data)
 
-m = MancalaDataset('./random_training_data.csv', './random_training_move_ratings.csv')
\ No newline at end of file
+    def tensors(self):
+        """
+        Returns all inputs and labels as two tensors, for loading the whole set at once
+        """
+
+        inputs = torch.tensor(self.data.to_numpy(dtype='float64'))
+        labels = torch.tensor([float(r) for r in self.ratings], dtype=torch.float64).unsqueeze(1)
+        return (inputs, labels)
+
+if __name__ == '__main__':
+    m = MancalaDataset('./random_training_data.csv', './random_training_move_ratings.csv')
+    print(f'{len(m)} rows')
@@ -1,32 +1,85 @@
+import os
+import re
 import csv
 import json
+import shutil
+import hashlib
+
+import game_path
+
+from mancala_helpers import canonical_state, canonical_move
+from position_index import PositionIndex
 
 """
 Transforms readable JSON training data into a CSV file for the dataset
 Calculates move ratings for each move in options
 Generates loss values based on winner and move rating
+Every row is written from the moving player's side of the board (see canonical_state)
 """
 
 class MancalaPipeline:
 
+    # Bump when rate_move() or the row layout changes, so cached shards are converted again
+    RATE_MOVE_VERSION = 2
+    FEATURE_LAYOUT = ['bowl1', 'bowl2', 'bowl3', 'bowl4', 'bowl5', 'bowl6',
+                      'bowl7', 'bowl8', 'bowl9', 'bowl10', 'bowl11', 'bowl12',
+                      'bank1', 'bank2', 'choice', 'refresh', 'capture', 'points_scored']
+    SHARD_SIZE = 500
+    DATA_FILE = 'random_training_data.csv'
+    RATINGS_FILE = 'random_training_move_ratings.csv'
+    COUNTS_FILE = 'random_training_move_counts.csv'
+    # get_log() writes each game as "gameN": {"id": ..., and the game count last, as "length": N
+    GAME_PATTERN = re.compile(rb'"game(\d+)": \{"id"')
+    LENGTH_PATTERN = re.compile(rb'(?:, )?"length": (\d+)\}\s*$')
+    CACHE_PATTERN = re.compile(r'[0-9a-f]{64}\..*')
+
     def __init__(self, file_name):
-        with open(file_name) as json_file:
-            self.data = json.load(json_file)
+        # The log is only parsed when games() is needed, convert_incremental() works on the raw bytes
+        with open(file_name, 'rb') as json_file:
+            self.raw = json_file.read()
+        self.data = None
+
+    def games(self):
+        if self.data is None:
+            self.data = json.loads(self.raw)
+        return [self.data[f'game{i}'] for i in range(self.data['length'])]
+
+    def game_spans(self):
+        """
+        Returns the (start, end) byte offsets of each game's object in the raw log, in game order
+        """
+
+        keys = {}
+        starts = {}
+        for match in self.GAME_PATTERN.finditer(self.raw):
+            keys[int(match.group(1))] = match.start()
+            starts[int(match.group(1))] = match.end() - len(b'{"id"')
+        length = self.LENGTH_PATTERN.search(self.raw, max(0, len(self.raw) - 64))
+        if length is None or sorted(starts) != list(range(int(length.group(1)))):
+            raise Exception('game_spans: Log is not in the layout get_log() writes')
+        # Each game ends where the ', ' before the next key starts
+        ends = [keys[i] - len(b', ') for i in range(1, len(keys))] + [length.start()]
+        return [(starts[i], ends[i]) for i in range(len(starts))]
+
+    def convert_games(self, games):
+        """
+        Returns the input rows and move ratings for a list of games
+        """
 
-    def convert(self):
         input_data = []
         move_ratings = []
-        for i in range(self.data['length']):
-            game = self.data[f'game{i}']
+        for game in games:
             if len(game['states']) != len(game['moves']):
                 print('Error: States and moves are different lengths!')
             for j in range(len(game['states'])):
 
                 # Create input data
-                curr = game['states'][j]['board']
-                curr.append(game['states'][j]['bank1'])
-                curr.append(game['states'][j]['bank2'])
-                curr.append(game['moves'][j]['choice'])
+                player = game['moves'][j]['player']
+                bowls, bank1, bank2 = canonical_state(game['states'][j]['board'], game['states'][j]['bank1'], game['states'][j]['bank2'], player)
+                curr = bowls
+                curr.append(bank1)
+                curr.append(bank2)
+                curr.append(canonical_move(game['moves'][j]['choice'], player))
                 curr.append(1 if game['moves'][j]['refresh'] else 0)
                 curr.append(1 if game['moves'][j]['capture'] else 0)
                 points_scored = game['moves'][j]['additions'][12] + game['moves'][j]['additions'][13]
@@ -34,20 +87,123 @@ class MancalaPipeline:
                 input_data.append(curr)
 
                 # Generate move rating
-                won = game['moves'][j]['player'] == game['winner']
-                move_ratings.append(self.rate_move(curr[4], curr[5], points_scored, won))
+                won = player == game['winner']
+                move_ratings.append(self.rate_move(curr[15], curr[16], points_scored, won))
+        return (input_data, move_ratings)
+
+    def convert(self, indexed=False):
+        """
+        Writes the training data and move ratings CSVs.
+        If indexed, repeated (board, choice) samples are merged into one row,
+        and a third CSV with the number of samples behind each row is written for weighted sampling.
+        """
+
+        input_data, move_ratings = self.convert_games(self.games())
+        self.write(input_data, move_ratings, indexed)
 
-        with open('random_training_data.csv', 'w', newline='') as file:
+    def write(self, input_data, move_ratings, indexed=False):
+        if indexed:
+            index = PositionIndex()
+            for row, rating in zip(input_data, move_ratings):
+                index.add(row, rating)
+            print(f'Indexed {len(input_data)} samples into {len(index)} rows')
+            index.save(self.DATA_FILE, self.RATINGS_FILE, self.COUNTS_FILE)
+            return
+
+        self.write_rows(self.DATA_FILE, self.RATINGS_FILE, input_data, move_ratings)
+
+    def write_rows(self, data_file, ratings_file, input_data, move_ratings):
+        with open(data_file, 'w', newline='') as file:
             writer = csv.writer(file)
             for row in input_data:
                 writer.writerow(row)
             file.close()
-        with open('random_training_move_ratings.csv', 'w', newline='') as file:
+        with open(ratings_file, 'w', newline='') as file:
             writer = csv.writer(file)
             for rating in move_ratings:
                 writer.writerow([rating])
             file.close()
 
+    def shard_key(self, raw):
+        """
+        Content hash of a shard's span of the raw log, together with the rating and layout versions
+        """
+
+        digest = hashlib.sha256()
+        digest.update(json.dumps([self.RATE_MOVE_VERSION, self.FEATURE_LAYOUT]).encode())
+        digest.update(raw)
+        return digest.hexdigest()
+
+    def convert_incremental(self, cache_dir='./pipeline_cache', shard_size=SHARD_SIZE, indexed=False):
+        """
+        Converts the log shard by shard, reusing shards converted by earlier runs
+        Each shard of shard_size games is hashed from its bytes in the log (see shard_key()),
+        and its data and ratings CSVs are cached in cache_dir under that key.
+        Appending games to the log only changes the last shard, so only it and the new ones are converted.
+        A manifest lists the shards that make up the final training set, and cache files it doesn't list are removed.
+        The output CSVs are the shard CSVs joined byte for byte, rows are only parsed again when indexed.
+        """
+
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        spans = self.game_spans()
+        view = memoryview(self.raw)
+        decoder = json.JSONDecoder()
+        keys = []
+        converted = 0
+        for start in range(0, len(spans), shard_size):
+            shard_spans = spans[start:start + shard_size]
+            first, last = shard_spans[0][0], shard_spans[-1][1]
+            key = self.shard_key(view[first:last])
+            keys.append(key)
+            data_file = os.path.join(cache_dir, f'{key}.data.csv')
+            ratings_file = os.path.join(cache_dir, f'{key}.ratings.csv')
+            if os.path.exists(data_file) and os.path.exists(ratings_file):
+                continue
+            text = self.raw[first:last].decode()
+            shard = [decoder.raw_decode(text, span[0] - first)[0] for span in shard_spans]
+            input_data, move_ratings = self.convert_games(shard)
+            # Write to temporary files first so an interrupted run never leaves a partial shard
+            self.write_rows(data_file + '.tmp', ratings_file + '.tmp', input_data, move_ratings)
+            os.replace(ratings_file + '.tmp', ratings_file)
+            os.replace(data_file + '.tmp', data_file)
+            converted += 1
+        print(f'Converted {converted} of {len(keys)} shards, reused {len(keys) - converted}')
+
+        manifest = {
+            'rate_move_version': self.RATE_MOVE_VERSION,
+            'feature_layout': self.FEATURE_LAYOUT,
+            'shard_size': shard_size,
+            'shards': keys,
+        }
+        with open(os.path.join(cache_dir, 'manifest.json'), 'w') as file:
+            json.dump(manifest, file)
+
+        # Shards from older logs, versions or shard sizes are no longer listed
+        listed = {f'{key}.{kind}.csv' for key in keys for kind in ('data', 'ratings')}
+        for name in os.listdir(cache_dir):
+            if name not in listed and self.CACHE_PATTERN.fullmatch(name):
+                os.remove(os.path.join(cache_dir, name))
+
+        # Assemble the training set from the manifest
+        if indexed:
+            input_data = []
+            move_ratings = []
+            for key in manifest['shards']:
+                with open(os.path.join(cache_dir, f'{key}.data.csv'), newline='') as file:
+                    input_data.extend([int(v) for v in row] for row in csv.reader(file))
+                with open(os.path.join(cache_dir, f'{key}.ratings.csv'), newline='') as file:
+                    move_ratings.extend(float(row[0]) for row in csv.reader(file))
+            self.write(input_data, move_ratings, indexed)
+            return
+
+        for output, kind in ((self.DATA_FILE, 'data'), (self.RATINGS_FILE, 'ratings')):
+            with open(output, 'wb') as file:
+                for key in manifest['shards']:
+                    with open(os.path.join(cache_dir, f'{key}.{kind}.csv'), 'rb') as shard_file:
+                        shutil.copyfileobj(shard_file, file)
+
     def rate_move(self, refresh, capture, points_scored, won):
         """
         Returns a move rating to be used as a label
@@ -64,5 +220,6 @@ class MancalaPipeline:
             rating = max(0, rating + 0)
         return rating
 
-m = MancalaPipeline('./mancala_data_raw.json')
-m.convert()
\ No newline at end of file
+if __name__ == '__main__':
+    m = MancalaPipeline('./mancala_data_raw.json')
+    m.convert()
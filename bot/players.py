@@ -0,0 +1,68 @@
+import random
+
+import game_path
+
+from search import best_move
+from eval_cache import EvaluationCache
+
+"""
+Move sources that can play either side of a game
+
+Every player has get_move(board, player), the same interface MancalaGame uses for its bot.
+Players are described by short specs so they can be rebuilt inside worker processes:
+    'random'            uniformly random legal moves
+    'search:N'          alpha-beta search N plies deep
+    'model:FILE'        a MancalaBotModel checkpoint from ./model_saves, with an evaluation cache
+"""
+
+class RandomPlayer:
+
+    def get_move(self, board, player):
+        return random.choice(board.options(player))
+
+
+class SearchPlayer:
+    TABLE_ENTRIES = 50000
+
+    def __init__(self, depth=4, table_entries=TABLE_ENTRIES):
+        self.depth = depth
+        self.table = {}
+        self.table_entries = table_entries
+
+    def get_move(self, board, player):
+        # Stored scores and bounds stay valid for the same depth, so the transposition table is reused across moves and games,
+        # but it is cleared once it holds table_entries positions to keep long matches from growing without bound
+        if len(self.table) > self.table_entries:
+            self.table.clear()
+        return best_move(board, player, self.depth, self.table)[0]
+
+
+class ModelPlayer:
+
+    def __init__(self, file_name='mancala_bot_model_save', cache_bytes=EvaluationCache.MAX_BYTES):
+        # torch is only imported when a model player is built
+        from mancala_bot import MancalaBot
+        self.cache = EvaluationCache(cache_bytes) if cache_bytes else None
+        self.bot = MancalaBot(None, 1, 0, 0, cache=self.cache)
+        self.bot.model.load(file_name)
+
+    def get_move(self, board, player):
+        return self.bot.get_move(board, player)
+
+    def stats(self):
+        return self.cache.stats() if self.cache else None
+
+
+def make_player(spec):
+    """
+    Builds a player from its spec string
+    """
+
+    name, _, arg = spec.partition(':')
+    if name == 'random':
+        return RandomPlayer()
+    elif name == 'search':
+        return SearchPlayer(int(arg) if arg else 4)
+    elif name == 'model':
+        return ModelPlayer(arg) if arg else ModelPlayer()
+    raise Exception('make_player: Invalid player spec: ' + str(spec))
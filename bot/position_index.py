@@ -0,0 +1,58 @@
+import csv
+
+"""
+Deduplicates training samples from the pipeline
+
+Each (board, choice) pair is hashed and repeated samples are folded into a single row.
+A row keeps how many times the pair was seen and the mean of its move ratings,
+which is the empirical win rate when ratings are plain 0/1 labels.
+"""
+
+class PositionIndex:
+
+    # Number of leading columns that identify a state-action pair:
+    # 12 bowls, bank 1, bank 2 and the choice
+    KEY_SIZE = 15
+
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, row, rating):
+        """
+        Adds a sample to the index, merging it with any previous sample of the same state-action pair
+        """
+
+        key = tuple(row[:self.KEY_SIZE])
+        entry = self.rows.get(key)
+        if entry is None:
+            self.rows[key] = [list(row), 1, rating]
+        else:
+            entry[1] += 1
+            entry[2] += rating
+
+    def __len__(self):
+        return len(self.rows)
+
+    def items(self):
+        """
+        Yields (row, count, mean rating) for each unique state-action pair
+        """
+
+        for row, count, total in self.rows.values():
+            yield (row, count, total / count)
+
+    def save(self, data_file, ratings_file, counts_file):
+        """
+        Writes the aggregated rows, mean ratings and counts as three aligned CSV files
+        """
+
+        with open(data_file, 'w', newline='') as data, \
+             open(ratings_file, 'w', newline='') as ratings, \
+             open(counts_file, 'w', newline='') as counts:
+            data_writer = csv.writer(data)
+            ratings_writer = csv.writer(ratings)
+            counts_writer = csv.writer(counts)
+            for row, count, rating in self.items():
+                data_writer.writerow(row)
+                ratings_writer.writerow([rating])
+                counts_writer.writerow([count])
@@ -1,7 +1,3 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import torch
-
 from mancala_dataset import MancalaDataset
 from mancala_bot import MancalaBot
 
@@ -9,16 +5,30 @@ from mancala_bot import MancalaBot
 Main file to run the bot
 """
 
-training_data = MancalaDataset('./random_training_data.csv', './random_training_move_ratings.csv')
-bot = MancalaBot(training_data, 64, 1, 0.03)
-loss_data = bot.train(record_data=True)
+def train(data_file='./random_training_data.csv', ratings_file='./random_training_move_ratings.csv', counts_file=None,
+          batch_size=64, epochs=1, lr=0.03, save=False):
+    """
+    Trains a bot on the pipeline's CSVs, returns the loss log
+    """
+
+    training_data = MancalaDataset(data_file, ratings_file, counts_file)
+    bot = MancalaBot(training_data, batch_size, epochs, lr, weighted=counts_file is not None)
+    return bot.train(save=save, record_data=True)
+
+
+def plot(loss_data):
+    # matplotlib is only needed for the plot
+    import matplotlib.pyplot as plt
+
+    y = loss_data[0][0]
+    x = loss_data[0][1]
+
+    plt.title('Batch vs Loss')
+    plt.xlabel('Batch')
+    plt.ylabel('Loss')
+    plt.plot(x, y, color='purple')
+    plt.show()
 
-# Plot log
-y = loss_data[0][0]
-x = loss_data[0][1]
 
-plt.title('Batch vs Loss')
-plt.xlabel('Batch')
-plt.ylabel('Loss')
-plt.plot(x, y, color='purple')
-plt.show()
\ No newline at end of file
+if __name__ == '__main__':
+    plot(train())
@@ -0,0 +1,217 @@
+import json
+import asyncio
+import itertools
+
+import game_path
+
+from mancala_helpers import make_board, next_player
+from players import make_player
+
+"""
+Asyncio server hosting many independent games over line-delimited JSON
+
+Each request and response is one JSON object per line, on TCP or a Unix socket.
+Requests:
+    {"op": "new", "players": ["human", "search:4"], "starting_player": 1}
+    {"op": "move", "session": 3, "choice": 2}        a human move, bot replies are played before responding
+    {"op": "run", "session": 3}                      plays bot moves until a human is to move or the game ends
+    {"op": "state", "session": 3}
+    {"op": "close", "session": 3}
+Responses are {"ok": true, ...} with the session state, or {"ok": false, "error": "..."}.
+Any "id" in a request is echoed back.
+
+Bot moves run in an executor so a slow search or model never stalls the event loop.
+Sessions are closed when the connection that created them closes.
+"""
+
+HOST = '127.0.0.1'
+PORT = 8765
+BACKLOG = 4096
+
+
+class GameSession:
+
+    def __init__(self, id, players, starting_player=1):
+        self.id = id
+        self.players = players # 1 and 2 map to a move source, or None for a human
+        self.board = make_board([4] * 12, 0, 0)
+        self.player = starting_player
+        self.over = False
+        self.lock = asyncio.Lock()
+
+    def options(self):
+        return [] if self.over else self.board.options(self.player)
+
+    def human_turn(self):
+        return not self.over and self.players[self.player] is None
+
+    def play(self, choice):
+        """
+        Plays a move for the player to move, returns the move log
+        """
+
+        # JSON true would otherwise match bowl 1, since True == 1
+        if type(choice) is not int or choice not in self.options():
+            raise ValueError(f'Invalid move {choice!r} for player {self.player}')
+        player = self.player
+        refresh, captured, additions, removals = self.board.sow(choice, player)
+        self.player = next_player(player, refresh)
+        self.over = self.board.finished(self.player)
+        return {'player': player, 'choice': choice, 'refresh': refresh, 'capture': captured > 0}
+
+    def winner(self):
+        if not self.over:
+            return None
+        if self.board.bank1().value > self.board.bank2().value:
+            return 1
+        elif self.board.bank2().value > self.board.bank1().value:
+            return 2
+        return 0
+
+    def state(self):
+        return {
+            'session': self.id,
+            'board': self.board.flatten(),
+            'bank1': self.board.bank1().value,
+            'bank2': self.board.bank2().value,
+            'player': self.player,
+            'options': self.options(),
+            'over': self.over,
+            'winner': self.winner(),
+        }
+
+
+class MatchServer:
+
+    def __init__(self, host=HOST, port=PORT, path=None, executor=None, backlog=BACKLOG):
+        self.host = host
+        self.port = port
+        self.path = path # Unix socket path, used instead of TCP when set
+        self.backlog = backlog # Pending connections, load tests open thousands at once
+        self.executor = executor # None uses the event loop's default thread pool
+        self.sessions = {}
+        self.players = {} # Futures of move sources shared between sessions, keyed by spec
+        self.ids = itertools.count()
+        self.server = None
+
+    async def start(self):
+        if self.path:
+            self.server = await asyncio.start_unix_server(self.handle, path=self.path, backlog=self.backlog)
+        else:
+            self.server = await asyncio.start_server(self.handle, self.host, self.port, backlog=self.backlog)
+        return self.server
+
+    async def serve_forever(self):
+        await self.start()
+        print(f'Serving on {self.path or (self.host, self.port)}')
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server:
+            self.server.close()
+
+    async def handle(self, reader, writer):
+        """
+        Serves one connection until it closes
+        """
+
+        owned = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = None
+                try:
+                    request = json.loads(line)
+                    response = await self.dispatch(request, owned)
+                    response['ok'] = True
+                except Exception as e:
+                    response = {'ok': False, 'error': str(e)}
+                if isinstance(request, dict) and 'id' in request:
+                    response['id'] = request['id']
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for id in owned:
+                self.sessions.pop(id, None)
+            writer.close()
+
+    async def dispatch(self, request, owned):
+        op = request.get('op')
+        if op == 'new':
+            specs = request.get('players', ['human', 'random'])
+            starting_player = request.get('starting_player', 1)
+            if not isinstance(specs, list) or len(specs) != 2:
+                raise ValueError(f'Invalid players {specs}')
+            if starting_player not in (1, 2):
+                raise ValueError(f'Invalid starting player {starting_player}')
+            # Players are resolved before the session is registered, so a bad spec leaves nothing behind
+            players = {1: await self.player(specs[0]), 2: await self.player(specs[1])}
+            session = GameSession(next(self.ids), players, starting_player)
+            self.sessions[session.id] = session
+            owned.add(session.id)
+            async with session.lock:
+                moves = await self.run_bots(session)
+            return {'state': session.state(), 'moves': moves}
+
+        session = self.sessions.get(request.get('session'))
+        if session is None:
+            raise KeyError(f'Unknown session {request.get("session")}')
+        if op == 'move':
+            async with session.lock:
+                if not session.human_turn():
+                    raise ValueError('Not a human turn')
+                moves = [session.play(request.get('choice'))]
+                moves += await self.run_bots(session)
+            return {'state': session.state(), 'moves': moves}
+        elif op == 'run':
+            async with session.lock:
+                moves = await self.run_bots(session)
+            return {'state': session.state(), 'moves': moves}
+        elif op == 'state':
+            return {'state': session.state()}
+        elif op == 'close':
+            self.sessions.pop(session.id, None)
+            owned.discard(session.id)
+            return {'state': session.state()}
+        raise ValueError(f'Invalid op {op}')
+
+    async def player(self, spec):
+        """
+        Returns the shared move source for spec, building it in the executor the first time
+        Building a model player imports torch and loads weights, which would stall the event loop
+        """
+
+        if spec == 'human':
+            return None
+        if spec not in self.players:
+            # The future is stored at once, so concurrent first requests wait on the same build
+            self.players[spec] = asyncio.get_running_loop().run_in_executor(self.executor, make_player, spec)
+        future = self.players[spec]
+        try:
+            return await future
+        except Exception:
+            if self.players.get(spec) is future:
+                del self.players[spec]
+            raise
+
+    async def run_bots(self, session):
+        """
+        Plays bot moves in the executor until a human is to move or the game is over
+        """
+
+        loop = asyncio.get_running_loop()
+        moves = []
+        while not session.over and not session.human_turn():
+            bot = session.players[session.player]
+            choice = await loop.run_in_executor(self.executor, bot.get_move, session.board, session.player)
+            moves.append(session.play(choice))
+        return moves
+
+
+if __name__ == '__main__':
+    asyncio.run(MatchServer().serve_forever())
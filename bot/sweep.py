@@ -0,0 +1,113 @@
+import os
+import time
+
+import torch
+import torch.multiprocessing as mp
+from torch.utils.data import TensorDataset
+
+from mancala_dataset import MancalaDataset
+from mancala_bot import MancalaBot
+
+"""
+Trains several bot configurations at once on one copy of the training set
+
+The CSVs are parsed once into tensors in shared memory, and every worker trains on views of them.
+Each worker process is pinned to its own CPUs, with torch using one thread per pinned CPU,
+so concurrent runs don't compete for cores.
+Prints a table of final loss, samples/sec and wall time per configuration.
+"""
+
+CONFIGS = [
+    {'batch_size': 64, 'lr': 0.03, 'hidden_neurons': 48},
+    {'batch_size': 64, 'lr': 0.003, 'hidden_neurons': 48},
+    {'batch_size': 256, 'lr': 0.03, 'hidden_neurons': 48},
+    {'batch_size': 64, 'lr': 0.03, 'hidden_neurons': 128},
+]
+EPOCHS = 1
+
+
+class SharedDataset(TensorDataset):
+    """
+    Tensor dataset with the optional sample counts MancalaBot uses for weighted sampling
+    """
+
+    def __init__(self, inputs, labels, counts=None):
+        super().__init__(inputs, labels)
+        self.counts = counts
+
+
+# Set in each worker by init_worker()
+shared_data = None
+
+def init_worker(inputs, labels, counts, cpu_sets):
+    global shared_data
+    shared_data = SharedDataset(inputs, labels, counts)
+    cpus = cpu_sets.get()
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(len(cpus))
+    # One throwaway training step pays torch's one-time setup, so it isn't timed with the first configuration
+    MancalaBot(None, 64, 0, 0.01).train_step(inputs[:64], labels[:64])
+
+
+def train_config(args):
+    """
+    Worker: trains one configuration, returns its results
+    """
+
+    config, epochs = args
+    start = time.time()
+    bot = MancalaBot(shared_data, config['batch_size'], epochs, config['lr'],
+                     weighted=shared_data.counts is not None, hidden_neurons=config['hidden_neurons'])
+    log = bot.train(record_data=True, verbose=False)
+    elapsed = time.time() - start
+    last_losses = log[-1][0]
+    return {
+        **config,
+        'final_loss': sum(last_losses) / len(last_losses),
+        'samples_per_second': epochs * len(shared_data) / elapsed,
+        'seconds': elapsed,
+    }
+
+
+def cpu_slices(processes):
+    """
+    Splits the CPUs this process may use into one set per worker
+    """
+
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count()))
+    size = max(1, len(cpus) // processes)
+    return [set(cpus[(i * size) % len(cpus):(i * size) % len(cpus) + size]) for i in range(processes)]
+
+
+def sweep(configs=CONFIGS, epochs=EPOCHS, data_file='./random_training_data.csv', ratings_file='./random_training_move_ratings.csv',
+          counts_file=None, processes=None):
+    """
+    Trains every configuration and returns their results, in the order given
+    """
+
+    start = time.time()
+    data = MancalaDataset(data_file, ratings_file, counts_file)
+    inputs, labels = data.tensors()
+    inputs.share_memory_()
+    labels.share_memory_()
+    print(f'Loaded {len(data)} rows in {time.time() - start:.2f}s')
+
+    if processes is None:
+        processes = min(len(configs), len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count())
+    cpu_sets = mp.Queue()
+    for cpus in cpu_slices(processes):
+        cpu_sets.put(cpus)
+
+    with mp.Pool(processes, init_worker, (inputs, labels, data.counts, cpu_sets)) as pool:
+        results = pool.map(train_config, [(config, epochs) for config in configs], chunksize=1)
+
+    print(f'{"batch":>6} {"lr":>8} {"hidden":>6} {"final loss":>11} {"samples/s":>10} {"wall s":>8}')
+    for r in results:
+        print(f'{r["batch_size"]:>6} {r["lr"]:>8g} {r["hidden_neurons"]:>6} {r["final_loss"]:>11.5f} {r["samples_per_second"]:>10.0f} {r["seconds"]:>8.2f}')
+    print(f'Sweep finished in {time.time() - start:.2f}s')
+    return results
+
+
+if __name__ == '__main__':
+    sweep()
@@ -0,0 +1,21 @@
+from tournament import Tournament
+
+"""
+Checks for the tournament's SPRT, fed results directly without playing games
+"""
+
+def test_one_sided_match_accepts_h1():
+    tournament = Tournament('search:4', 'random')
+    while tournament.llr() < tournament.upper:
+        assert tournament.games() < 48
+        tournament.add_pair([1, 1])
+    elo, low, high = tournament.interval()
+    assert 0 < low < elo < high
+
+
+def test_even_match_accepts_h0():
+    tournament = Tournament('random', 'random')
+    while tournament.llr() > tournament.lower:
+        assert tournament.games() < 20000
+        tournament.add_pair([1, 0])
+    assert tournament.wins == tournament.losses
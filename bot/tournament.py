@@ -0,0 +1,212 @@
+import math
+import time
+import random
+from multiprocessing import Pool
+
+import game_path
+
+from mancala_helpers import make_board, next_player
+from players import make_player
+
+"""
+Plays matches between two move sources in a process pool
+
+Games are played in pairs with the same opening and alternating starting_player, so neither side gains from moving first.
+Results are reported from player A's view as win/draw/loss, Elo difference and a 95% confidence interval.
+
+A sequential probability ratio test checks after every pair whether A is ELO1 stronger (H1) or only ELO0 (H0),
+and the match stops as soon as either is accepted, or at MAX_GAMES.
+The test and the confidence interval use the pentanomial model: pairs are counted by their total score,
+since the two games of a pair share an opening and are not independent.
+
+Usage:
+    result = Tournament('model:mancala_bot_model_save', 'random').run()
+"""
+
+PLAYER_A = 'search:4'
+PLAYER_B = 'random'
+MAX_GAMES = 20000
+ELO0 = 0
+ELO1 = 20
+ALPHA = 0.05
+BETA = 0.05
+# Added to each pentanomial count, so the variance is never zero (as fishtest does for its trinomial counts)
+PAIR_PRIOR = 0.5
+
+
+def play_game(players, starting_player=1, opening=()):
+    """
+    Plays a game and returns the winner, 0 for a tie
+    players maps 1 and 2 to move sources. The opening moves are played first, by index into the mover's options
+    """
+
+    board = make_board([4] * 12, 0, 0)
+    player = starting_player
+    ply = 0
+    while board.sum() > 0:
+        options = board.options(player)
+        if ply < len(opening):
+            choice = options[opening[ply] % len(options)]
+        else:
+            choice = players[player].get_move(board, player)
+        refresh = board.sow(choice, player)[0]
+        player = next_player(player, refresh)
+        ply += 1
+        if board.finished(player):
+            break
+
+    if board.bank1().value > board.bank2().value:
+        return 1
+    elif board.bank2().value > board.bank1().value:
+        return 2
+    return 0
+
+
+# Players are built once per worker process
+worker_players = None
+
+def init_worker(spec_a, spec_b):
+    global worker_players
+    worker_players = (make_player(spec_a), make_player(spec_b))
+
+
+def play_pair(args):
+    """
+    Worker: plays one opening twice with A as player 1 and the starting player swapped
+    Returns A's two scores (1 win, 0.5 tie, 0 loss)
+    """
+
+    seed, opening_plies = args
+    rng = random.Random(seed)
+    opening = tuple(rng.randrange(6) for i in range(opening_plies))
+    random.seed(seed)
+    players = {1: worker_players[0], 2: worker_players[1]}
+    scores = []
+    for starting_player in (1, 2):
+        winner = play_game(players, starting_player, opening)
+        scores.append(0.5 if winner == 0 else float(winner == 1))
+    return scores
+
+
+def expected_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+class Tournament:
+
+    def __init__(self, player_a=PLAYER_A, player_b=PLAYER_B, max_games=MAX_GAMES, elo0=ELO0, elo1=ELO1, alpha=ALPHA, beta=BETA, opening_plies=2, processes=None):
+        self.player_a = player_a
+        self.player_b = player_b
+        self.max_games = max_games
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.opening_plies = opening_plies
+        self.processes = processes
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        self.pairs = [0] * 5 # Pairs by A's total score over both games: 0, 0.5, 1, 1.5, 2
+
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def add(self, score):
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def add_pair(self, scores):
+        """
+        Records both games of a pair, and the pair's total in the pentanomial counts
+        """
+
+        for score in scores:
+            self.add(score)
+        self.pairs[int(2 * sum(scores))] += 1
+
+    def pair_stats(self):
+        """
+        Returns the number of pairs, A's mean score per game and the variance of a pair's mean score
+        Every pentanomial count is regularized by PAIR_PRIOR, so a one-sided match still has a variance
+        """
+
+        counts = [count + PAIR_PRIOR for count in self.pairs]
+        n = sum(counts)
+        totals = [i / 4 for i in range(5)] # Mean score per game for pair totals 0, 0.5, 1, 1.5, 2
+        s = sum(count * total for count, total in zip(counts, totals)) / n
+        var = sum(count * (total - s) ** 2 for count, total in zip(counts, totals)) / n
+        return n, s, var
+
+    def llr(self):
+        """
+        Log likelihood ratio of H1 (A is elo1 stronger) against H0 (elo0), normal approximation of the pentanomial
+        Each pair shares an opening, so pairs rather than games are the independent samples
+        """
+
+        n, s, var = self.pair_stats()
+        s0 = expected_score(self.elo0)
+        s1 = expected_score(self.elo1)
+        return n * ((s - s0) ** 2 - (s - s1) ** 2) / (2 * var)
+
+    def interval(self):
+        """
+        Returns the Elo difference and its 95% confidence interval
+        """
+
+        n, s, var = self.pair_stats()
+        margin = 1.96 * math.sqrt(var / n)
+        return (elo(s), elo(s - margin), elo(s + margin))
+
+    def run(self):
+        """
+        Plays pairs of games until the SPRT accepts a hypothesis or max_games is reached
+        Returns a dict summarising the match
+        """
+
+        start = time.time()
+        verdict = 'inconclusive'
+        seeds = ((seed, self.opening_plies) for seed in range(self.max_games // 2))
+        with Pool(self.processes, init_worker, (self.player_a, self.player_b)) as pool:
+            for scores in pool.imap_unordered(play_pair, seeds, chunksize=4):
+                self.add_pair(scores)
+                llr = self.llr()
+                if llr >= self.upper:
+                    verdict = 'H1'
+                    break
+                elif llr <= self.lower:
+                    verdict = 'H0'
+                    break
+            pool.terminate()
+
+        elo_diff, elo_low, elo_high = self.interval()
+        result = {
+            'player_a': self.player_a,
+            'player_b': self.player_b,
+            'games': self.games(),
+            'wins': self.wins,
+            'draws': self.draws,
+            'losses': self.losses,
+            'elo': elo_diff,
+            'elo_low': elo_low,
+            'elo_high': elo_high,
+            'llr': self.llr(),
+            'verdict': verdict,
+            'seconds': time.time() - start,
+        }
+        print(f'{self.player_a} vs {self.player_b}: {self.games()} games, +{self.wins} ={self.draws} -{self.losses}')
+        print(f'Elo {elo_diff:+.1f} [{elo_low:+.1f}, {elo_high:+.1f}], LLR {result["llr"]:.2f} ({self.lower:.2f}, {self.upper:.2f}), {verdict}')
+        return result
+
+
+if __name__ == '__main__':
+    Tournament().run()
@@ -0,0 +1,208 @@
+import os
+import sys
+import argparse
+
+"""
+Command line entry point
+
+    python cli.py generate --games 10000
+    python cli.py convert --indexed
+    python cli.py train --epochs 1 --plot
+    python cli.py sweep --batch-sizes 64,256 --lrs 0.03,0.003 --hidden 48,128
+    python cli.py play --mode random --gui
+    python cli.py evaluate model:mancala_bot_model_save random
+    python cli.py serve --port 8765
+    python cli.py loadtest --spawn --connections 1000
+
+Each subcommand imports only what it needs, so generating data never loads torch, pandas, pygame or matplotlib.
+"""
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+for path in (os.path.join(ROOT, 'game'), os.path.join(ROOT, 'bot')):
+    if path not in sys.path:
+        sys.path.append(path)
+
+# Modes where MancalaGame asks a bot for moves, so they need --bot
+BOT_MODES = ('bot', 'bot_vs_bot', 'bot_vs_random_training', 'bot_vs_bot_training')
+
+
+def load_player(spec):
+    if spec is None:
+        return None
+    from players import make_player
+    return make_player(spec)
+
+
+def load_book(file_name):
+    if file_name is None:
+        return None
+    from opening_book import OpeningBook
+    return OpeningBook(file_name)
+
+
+def generate(args):
+    from mancala import MancalaGame
+
+    game = MancalaGame(args.starting_player, args.games, args.mode, bot=load_player(args.bot), book=load_book(args.book))
+    game.gen_data()
+    game.get_log(args.output)
+
+
+def convert(args):
+    from pipeline import MancalaPipeline
+
+    pipeline = MancalaPipeline(args.input)
+    if args.incremental:
+        pipeline.convert_incremental(args.cache_dir, args.shard_size, indexed=args.indexed)
+    else:
+        pipeline.convert(indexed=args.indexed)
+
+
+def train(args):
+    import run_bot
+
+    loss_data = run_bot.train(args.data, args.ratings, args.counts, args.batch_size, args.epochs, args.lr, save=args.save)
+    if args.plot:
+        run_bot.plot(loss_data)
+
+
+def sweep(args):
+    import itertools
+    from sweep import sweep
+
+    configs = [{'batch_size': b, 'lr': lr, 'hidden_neurons': h}
+               for b, lr, h in itertools.product(args.batch_sizes, args.lrs, args.hidden)]
+    sweep(configs, args.epochs, args.data, args.ratings, args.counts, args.processes)
+
+
+def play(args):
+    if args.gui or args.mode == 'replay':
+        from gui import GUI
+
+        GUI(args.width, args.height, args.mode, args.starting_player, delay=args.delay,
+            bot=load_player(args.bot), book=load_book(args.book), log_file=args.log).run()
+        return
+
+    from mancala import MancalaGame
+
+    game = MancalaGame(args.starting_player, 1, args.mode, bot=load_player(args.bot), book=load_book(args.book))
+    game.start_game(starting_player=args.starting_player)
+    while True:
+        update = game.step()
+        if update[0]:
+            break
+    if args.mode != 'default':
+        print(f'Player {update[1]} won! Banks: {game.board.bank1().value} - {game.board.bank2().value}')
+
+
+def evaluate(args):
+    from tournament import Tournament
+
+    Tournament(args.player_a, args.player_b, args.max_games, args.elo0, args.elo1, args.alpha, args.beta,
+               processes=args.processes).run()
+
+
+def serve(args):
+    import asyncio
+    from server import MatchServer
+
+    asyncio.run(MatchServer(args.host, args.port, args.path).serve_forever())
+
+
+def loadtest(args):
+    import asyncio
+    from load_client import load_test
+
+    asyncio.run(load_test(args.host, args.port, args.path, args.connections, args.games, args.opponent, args.spawn))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='mancala', description='Mancala engine, data pipeline and bot')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p = subparsers.add_parser('generate', help='play training games and save the log')
+    p.add_argument('--games', type=int, default=10000)
+    p.add_argument('--mode', default='random_training', choices=['random_training', 'bot_vs_random_training', 'bot_vs_bot_training'])
+    p.add_argument('--starting-player', type=int, default=1, choices=[1, 2])
+    p.add_argument('--bot', help='player spec for bot modes, e.g. search:4 or model:mancala_bot_model_save')
+    p.add_argument('--book', help='opening book file')
+    p.add_argument('--output', default='mancala_data_raw.json')
+    p.set_defaults(func=generate)
+
+    p = subparsers.add_parser('convert', help='convert a game log into training CSVs')
+    p.add_argument('--input', default='./mancala_data_raw.json')
+    p.add_argument('--indexed', action='store_true', help='merge repeated (board, choice) samples')
+    p.add_argument('--incremental', action='store_true', help='reuse shards converted by earlier runs')
+    p.add_argument('--cache-dir', default='./pipeline_cache')
+    p.add_argument('--shard-size', type=int, default=500, help='games per cached shard')
+    p.set_defaults(func=convert)
+
+    p = subparsers.add_parser('train', help='train the bot on the training CSVs')
+    p.add_argument('--data', default='./random_training_data.csv')
+    p.add_argument('--ratings', default='./random_training_move_ratings.csv')
+    p.add_argument('--counts', help='counts CSV from an indexed convert, enables weighted sampling')
+    p.add_argument('--batch-size', type=int, default=64)
+    p.add_argument('--epochs', type=int, default=1)
+    p.add_argument('--lr', type=float, default=0.03)
+    p.add_argument('--save', action='store_true')
+    p.add_argument('--plot', action='store_true')
+    p.set_defaults(func=train)
+
+    p = subparsers.add_parser('sweep', help='train a grid of configurations concurrently on one shared dataset')
+    p.add_argument('--data', default='./random_training_data.csv')
+    p.add_argument('--ratings', default='./random_training_move_ratings.csv')
+    p.add_argument('--counts', help='counts CSV from an indexed convert, enables weighted sampling')
+    p.add_argument('--batch-sizes', type=lambda v: [int(x) for x in v.split(',')], default=[64])
+    p.add_argument('--lrs', type=lambda v: [float(x) for x in v.split(',')], default=[0.03])
+    p.add_argument('--hidden', type=lambda v: [int(x) for x in v.split(',')], default=[48])
+    p.add_argument('--epochs', type=int, default=1)
+    p.add_argument('--processes', type=int)
+    p.set_defaults(func=sweep)
+
+    p = subparsers.add_parser('play', help='play a game in the console or the GUI, or replay a log')
+    p.add_argument('--mode', default='random', choices=['default', 'random', 'bot', 'bot_vs_bot', 'replay'])
+    p.add_argument('--starting-player', type=int, default=1, choices=[1, 2])
+    p.add_argument('--bot', help='player spec for bot modes')
+    p.add_argument('--book', help='opening book file')
+    p.add_argument('--gui', action='store_true')
+    p.add_argument('--width', type=int, default=1200)
+    p.add_argument('--height', type=int, default=700)
+    p.add_argument('--delay', type=float, default=1)
+    p.add_argument('--log', default='mancala_data_raw.json', help='game log for replay mode')
+    p.set_defaults(func=play)
+
+    p = subparsers.add_parser('evaluate', help='play a match between two players until the result is significant')
+    p.add_argument('player_a')
+    p.add_argument('player_b')
+    p.add_argument('--max-games', type=int, default=20000)
+    p.add_argument('--elo0', type=float, default=0)
+    p.add_argument('--elo1', type=float, default=20)
+    p.add_argument('--alpha', type=float, default=0.05)
+    p.add_argument('--beta', type=float, default=0.05)
+    p.add_argument('--processes', type=int)
+    p.set_defaults(func=evaluate)
+
+    p = subparsers.add_parser('serve', help='host games over line-delimited JSON')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8765)
+    p.add_argument('--path', help='Unix socket path, instead of TCP')
+    p.set_defaults(func=serve)
+
+    p = subparsers.add_parser('loadtest', help='load test the game server and report latency percentiles')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8765)
+    p.add_argument('--path', help='Unix socket path, instead of TCP')
+    p.add_argument('--connections', type=int, default=200)
+    p.add_argument('--games', type=int, default=5, help='games per connection')
+    p.add_argument('--opponent', default='random', help='player spec for the server side')
+    p.add_argument('--spawn', action='store_true', help='run the server in the same process')
+    p.set_defaults(func=loadtest)
+
+    args = parser.parse_args(argv)
+    if getattr(args, 'mode', None) in BOT_MODES and args.bot is None:
+        parser.error(f'--mode {args.mode} needs a player spec in --bot')
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
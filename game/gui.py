@@ -1,37 +1,69 @@
 import math
+import queue
 import time
+from collections import deque
 
 import pygame
 from pygame.locals import *
 
 from mancala import MancalaGame
-from gui_helpers import Board, Bowl, Bank
+from gui_helpers import Board, Bowl, Bank, MoveWorker
+from replay import ReplayLog
 
 """
 A class to run the mancala engine in a GUI game loop
+
+With cached=True the static layers are rendered once, and each step only redraws
+the bowls and banks the move changed, pushing just those rects to the display.
+
+Engine steps, including random and bot moves, run on a MoveWorker thread.
+The event loop runs at a fixed frame rate, reads results from the worker's queue,
+and animates the sowing one piece at a time, so the window stays responsive however long a move takes.
+
+Replay mode ('replay') plays back a get_log() file through the same animation path. Controls:
+    Space: play/pause          Left/Right: step one ply back/forward
+    Up/Down: double/halve speed  R: reverse the play direction
+    Page Up/Page Down: previous/next game
+    Home/End: start/end of the game  0-9: seek to 0%-90% of the game
 """
 
+# Engine indices in sowing order, banks included
+SOWING_ORDER = [0, 1, 2, 3, 4, 5, 12, 6, 7, 8, 9, 10, 11, 13]
+
 class GUI:
     BACKGROUND_COLOR = (46, 42, 39)
 
-    def __init__(self, width, height, mode, starting_player, delay=0.5):
+    # Above this replay speed plies are shown without animating the pieces
+    MAX_ANIMATED_SPEED = 16
+
+    def __init__(self, width, height, mode, starting_player, delay=0.5, cached=True, fps=60, sow_interval=0.08, bot=None, book=None, log_file='mancala_data_raw.json', keyframe_interval=16):
         if height > width:
             raise Exception('Invalid window size')
         self.width = width
         self.height = height
         self.mode = mode
         self.player = starting_player
-        self.delay = delay # Sets time.sleep() amount for automated moves
+        self.delay = delay # Wait before automated moves
+        self.cached = cached
+        self.fps = fps
+        self.frame_budget = 0.5 / fps # Time per frame that animation work may use
+        self.sow_interval = sow_interval # Time between animated pieces
+        self.bot = bot
+        self.book = book
+        self.log_file = log_file
+        self.keyframe_interval = keyframe_interval
+        self.labels = {} # Rendered text, keyed by (text, color)
+        self.player_area = None
+        self.win_area = None
 
-    def run(self):
-        # Start Mancala oracle
-        self.game = MancalaGame(mode=self.mode, gui=True, )
-        self.game.start_game()
+    def setup(self):
+        """
+        Opens the window and draws the initial board
+        """
 
-        # Setup
         pygame.init()
         font_list = pygame.font.get_fonts()
-        self.font_name = 'monospace'
+        font_name = 'monospace'
         for f in font_list:
             if 'bold' in f:
                 font_name = f
@@ -42,67 +74,308 @@ class GUI:
         # Create initial board state
         self.board = Board((self.width, self.height), font_name)
 
-        # Draw initial board state
-        self.render_screen()
+        # waiting: a step has been sent to the worker and its result hasn't arrived
+        # animation: pending (engine index, pieces) events, 0 pieces empties the position and -1 takes one piece out,
+        # an event with no index carries the position values to sync to once the pieces have moved
+        self.waiting = False
+        self.animation = deque()
+        self.finished = False
+        self.win_label = None
+        self.win_pending = False
+        self.next_piece = 0
+        self.next_auto_move = time.perf_counter() + self.delay
+
+    def draw(self):
+        """
+        Draws the whole screen
+        """
+
+        if self.cached:
+            self.render_screen_cached()
+        else:
+            self.render_screen()
         pygame.display.flip()
 
+    def run(self):
+        if self.mode == 'replay':
+            return self.run_replay()
+
+        # Start Mancala oracle
+        self.game = MancalaGame(starting_player=self.player, mode=self.mode, gui=True, bot=self.bot, book=self.book)
+        self.game.start_game(starting_player=self.player)
+        self.worker = MoveWorker(self.game)
+        self.worker.start()
+
+        self.setup()
+        self.draw()
+
         # Main game loop
+        clock = pygame.time.Clock()
         running = True
-        finished = False
         while running:
             for event in pygame.event.get():
-                if event.type == MOUSEBUTTONDOWN and event.button == 1 and not finished:
+                if event.type == MOUSEBUTTONDOWN and event.button == 1 and self.idle() and not self.automated(self.game.player):
                     pos = pygame.mouse.get_pos()
                     for bowl in [b for b in self.board.bowls if b.id in self.game.get_options()]:
                         dist_x = pos[0] - (bowl.pos[0] + 0.1*self.width)
                         dist_y = pos[1] - (bowl.pos[1] + 0.25*self.height)
                         dist = math.hypot(dist_x, dist_y)
                         if dist <= bowl.radius:
-                            finished = self.game_step(bowl)
-                            pygame.display.flip()
-                            # If not in default mode, we need to step again to override manual P2 move
-                            if self.mode == 'random' and self.game.player == 2 and not finished:
-                                while self.game.player == 2 and not finished:
-                                    time.sleep(self.delay)
-                                    finished = self.game_step()
-                                    pygame.display.flip()
+                            self.request_step(bowl.id)
                 elif event.type == KEYDOWN:
                     if event.key == K_ESCAPE:
                         running = False
                 elif event.type == QUIT:
                     running = False
 
-    def game_step(self, choice=None):
+            self.receive_step()
+            if self.idle() and self.automated(self.game.player) and time.perf_counter() >= self.next_auto_move:
+                self.request_step(None)
+            self.present(self.animate())
+            clock.tick(self.fps)
+
+        self.worker.stop()
+
+    def automated(self, player):
         """
-        Performs a game step and returns a boolean to show whether or not the game ended
-        Game is manual for both players by default.
+        Returns whether the engine picks the moves for player in this mode
         """
-        
-        finish = False
-        win_label = None
-        # Run a game step
-        update = None
-        if choice:
-            update = self.game.step(choice.id)
-        else:
-            update = self.game.step()
+
+        if self.mode in ['random', 'bot']:
+            return player == 2
+        return self.mode == 'bot_vs_bot'
+
+    def idle(self):
+        """
+        Returns whether the engine can take a new step: no step in flight, no animation playing, and the game is not over
+        """
+
+        return not self.waiting and not self.animation and not self.finished
+
+    def request_step(self, choice):
+        """
+        Sends a step to the worker thread, None lets the engine choose the move
+        """
+
+        self.waiting = True
+        self.worker.requests.put(choice)
+
+    def receive_step(self):
+        """
+        Checks the worker for a finished step, and queues its animation
+        """
+
+        try:
+            update, move = self.worker.results.get_nowait()
+        except queue.Empty:
+            return
+        self.waiting = False
+        if not self.animation:
+            self.next_piece = time.perf_counter()
+        if isinstance(update, Exception):
+            raise update
         if update[0]:
-            win_label = self.font.render(f'Player {update[1]} wins!', 1, (0,255,255))
-            finish = True
+            self.finished = True
+            self.win_label = self.text(f'Player {update[1]} wins!', (0,255,255))
         if update[2] and update[3]:
-            # Update gui board
-            for i, a in enumerate(update[2]):
-                if a > 0 and i < 12:
-                    self.board.bowls[i].add(a)
-                elif a > 0 and i >= 12:
-                    self.board.banks[12 - i].add(a)
-            for i, r in enumerate(update[3]):
-                if r >= 1 and i < 12:
-                    self.board.bowls[i].remove_all()
-                elif r > 1 and i >= 12:
-                    self.board.banks[i - 12].remove_all()
-        self.render_screen(win_label)
-        return finish
+            self.queue_animation(update[2], update[3], move[0] if move else None)
+        # The worker is idle until the next request, so the engine board can be read here
+        self.animation.append((None, [p.value for p in self.game.board.positions]))
+
+    def queue_animation(self, additions, removals, choice):
+        """
+        Queues the sowing as single piece events: the chosen bowl empties,
+        pieces land in sowing order after it, then any captured or swept positions empty
+        """
+
+        if choice is not None:
+            self.animation.append((choice, 0))
+        start = SOWING_ORDER.index(choice) + 1 if choice is not None else 0
+        for i in range(len(SOWING_ORDER)):
+            index = SOWING_ORDER[(start + i) % len(SOWING_ORDER)]
+            for piece in range(additions[index]):
+                self.animation.append((index, 1))
+        for index, r in enumerate(removals):
+            if r > 0 and index != choice:
+                self.animation.append((index, 0))
+
+    def animate(self):
+        """
+        Plays the animation events that are due, within the frame budget
+        Returns the engine indices that changed
+        """
+
+        dirty = set()
+        if not self.animation:
+            return dirty
+        now = time.perf_counter()
+        deadline = now + self.frame_budget
+        while self.animation and now >= self.next_piece and time.perf_counter() < deadline:
+            index, pieces = self.animation.popleft()
+            if index is None:
+                dirty.update(self.sync(pieces))
+                self.win_pending = self.finished
+                self.next_auto_move = now + self.delay
+                continue
+            position = self.board.position(index)
+            if pieces == 0:
+                position.remove_all()
+            elif pieces < 0:
+                position.remove(-pieces)
+                self.next_piece += self.sow_interval
+            else:
+                position.add(pieces)
+                self.next_piece += self.sow_interval
+            dirty.add(index)
+        return dirty
+
+    def sync(self, values):
+        """
+        Matches every bowl and bank with the given position values, returns the engine indices that were corrected
+        """
+
+        changed = []
+        for index in range(14):
+            position = self.board.position(index)
+            if position.value != values[index]:
+                position.remove_all()
+                position.add(values[index])
+                changed.append(index)
+        return changed
+
+    def present(self, dirty):
+        """
+        Pushes the frame to the display if anything changed
+        """
+
+        if not dirty and not self.win_pending:
+            return
+        if self.cached:
+            self.update_screen(sorted(dirty), self.win_label if self.win_pending else None)
+        else:
+            self.render_screen(self.win_label if self.finished and not self.animation else None)
+            pygame.display.flip()
+        self.win_pending = False
+
+    def run_replay(self):
+        """
+        Plays back the games in log_file
+        """
+
+        self.log = ReplayLog(self.log_file, self.keyframe_interval)
+        self.playing = False
+        self.direction = 1
+        self.speed = 1
+        self.base_delay = self.delay
+        self.base_sow_interval = self.sow_interval
+        self.setup()
+        self.load_game(0)
+        self.draw()
+
+        clock = pygame.time.Clock()
+        running = True
+        while running:
+            for event in pygame.event.get():
+                if event.type == KEYDOWN:
+                    if event.key == K_ESCAPE:
+                        running = False
+                    elif event.key == K_SPACE:
+                        self.playing = not self.playing
+                    elif event.key == K_RIGHT:
+                        self.playing = False
+                        self.advance(1)
+                    elif event.key == K_LEFT:
+                        self.playing = False
+                        self.advance(-1)
+                    elif event.key == K_UP:
+                        self.set_speed(self.speed * 2)
+                    elif event.key == K_DOWN:
+                        self.set_speed(self.speed / 2)
+                    elif event.key == K_r:
+                        self.direction = -self.direction
+                    elif event.key == K_PAGEDOWN and self.replay_index + 1 < len(self.log):
+                        self.load_game(self.replay_index + 1)
+                    elif event.key == K_PAGEUP and self.replay_index > 0:
+                        self.load_game(self.replay_index - 1)
+                    elif event.key == K_HOME:
+                        self.seek(0)
+                    elif event.key == K_END:
+                        self.seek(self.replay.length)
+                    elif K_0 <= event.key <= K_9:
+                        self.seek((event.key - K_0) * self.replay.length // 10)
+                    self.present(set(range(14)) if self.cached else {0})
+                elif event.type == QUIT:
+                    running = False
+
+            if self.playing and not self.animation and time.perf_counter() >= self.next_auto_move:
+                if not self.advance(self.direction):
+                    self.playing = False
+            self.present(self.animate())
+            clock.tick(self.fps)
+
+    def load_game(self, index):
+        """
+        Shows the start of a game from the log
+        """
+
+        self.replay_index = index
+        self.replay = self.log.game(index)
+        self.seek(0)
+
+    def seek(self, ply):
+        """
+        Jumps straight to a ply, without animating
+        """
+
+        self.animation.clear()
+        self.ply = max(0, min(ply, self.replay.length))
+        values, player = self.replay.position(self.ply)
+        self.sync(values)
+        self.show_winner()
+
+    def set_speed(self, speed):
+        self.speed = max(0.25, min(speed, 256))
+        self.delay = self.base_delay / self.speed
+        self.sow_interval = self.base_sow_interval / self.speed
+
+    def advance(self, direction):
+        """
+        Moves one ply forward or back, animated from the logged additions and removals
+        Returns False at either end of the game
+        """
+
+        ply = self.ply + direction
+        if ply < 0 or ply > self.replay.length:
+            return False
+        if self.speed > self.MAX_ANIMATED_SPEED:
+            self.seek(ply)
+            self.next_auto_move = time.perf_counter() + self.delay
+            return True
+
+        move = self.replay.moves[min(self.ply, ply)]
+        self.ply = ply
+        self.next_piece = time.perf_counter()
+        if direction > 0:
+            self.queue_animation(move['additions'], move['removals'], move['choice'])
+        else:
+            # Take the sown pieces back out in reverse order, the sync puts back the emptied bowls
+            start = SOWING_ORDER.index(move['choice']) + 1
+            for i in reversed(range(len(SOWING_ORDER))):
+                index = SOWING_ORDER[(start + i) % len(SOWING_ORDER)]
+                for piece in range(move['additions'][index]):
+                    self.animation.append((index, -1))
+        self.animation.append((None, self.replay.position(ply)[0]))
+        self.show_winner()
+        return True
+
+    def show_winner(self):
+        """
+        Shows the winner label while the replay is on the last ply
+        """
+
+        self.finished = self.ply == self.replay.length
+        self.win_label = self.text(f'Player {self.replay.winner} wins!', (0,255,255)) if self.finished else None
+        self.win_pending = self.finished
 
     def render_screen(self, win_label=None):
         """
@@ -114,7 +387,7 @@ class GUI:
         mancala_label = self.font.render('Mancala', 1, (255,255,0))
         self.screen.blit(mancala_label, (0.5 * self.width - 0.5 * mancala_label.get_width(), 0.1 * self.height))
 
-        player_label = self.font.render(f'Player {self.game.player}\'s turn', 1, (0,255,255))
+        player_label = self.status_label()
         self.screen.blit(player_label, (0.5 * self.width - 0.5 * player_label.get_width(), 0.8 * self.height))
 
         if win_label:
@@ -123,7 +396,80 @@ class GUI:
         self.screen.blit(self.board.render(), self.board.pos)
         
         return self.screen
-            
 
-g = GUI(1200, 700, 'random', 1, delay=1)
-g.run()
\ No newline at end of file
+    def text(self, text, color):
+        """
+        Returns a rendered label, rendering it only the first time it is asked for
+        """
+
+        key = (text, color)
+        if key not in self.labels:
+            self.labels[key] = self.font.render(text, 1, color)
+        return self.labels[key]
+
+    def render_screen_cached(self):
+        """
+        Draws the whole screen once, for later update_screen() calls to patch
+        """
+
+        self.screen.fill(self.BACKGROUND_COLOR)
+        mancala_label = self.text('Mancala', (255,255,0))
+        self.screen.blit(mancala_label, (0.5 * self.width - 0.5 * mancala_label.get_width(), 0.1 * self.height))
+        self.blit_player_label()
+        self.screen.blit(self.board.render_cached(), (int(self.board.pos[0]), int(self.board.pos[1])))
+        return self.screen
+
+    def status_label(self):
+        """
+        Returns the label under the board: whose turn it is, or the replay position
+        """
+
+        if self.mode == 'replay':
+            state = 'playing' if self.playing else 'paused'
+            direction = '' if self.direction > 0 else ' reversed'
+            return self.font.render(f'Game {self.replay_index + 1}/{len(self.log)}  Ply {self.ply}/{self.replay.length}  x{self.speed:g}  {state}{direction}', 1, (0,255,255))
+        return self.text(f'Player {self.game.player}\'s turn', (0,255,255))
+
+    def blit_player_label(self):
+        """
+        Draws the turn label over the previous one and returns the changed rect
+        """
+
+        player_label = self.status_label()
+        rect = player_label.get_rect(topleft=(0.5 * self.width - 0.5 * player_label.get_width(), 0.8 * self.height))
+        dirty = rect
+        if self.player_area:
+            self.screen.fill(self.BACKGROUND_COLOR, self.player_area)
+            dirty = rect.union(self.player_area)
+        self.screen.blit(player_label, rect)
+        self.player_area = rect
+        return dirty
+
+    def update_screen(self, dirty, win_label=None):
+        """
+        Redraws the given engine positions and the turn label, and updates only those rects on the display
+        """
+
+        rects = [self.blit_player_label()]
+        offset = (int(self.board.pos[0]), int(self.board.pos[1]))
+        for area in self.board.redraw(dirty):
+            rects.append(self.screen.blit(self.board.surface, area.move(offset), area))
+        if self.win_area and not self.finished:
+            # A replay moved away from the last ply
+            self.screen.fill(self.BACKGROUND_COLOR, self.win_area)
+            rects.append(self.win_area)
+            self.win_area = None
+        if win_label:
+            pos = (0.5 * self.width - 0.5 * win_label.get_width(), 0.05 * self.height - 0.5 * win_label.get_height())
+            if self.win_area:
+                self.screen.fill(self.BACKGROUND_COLOR, self.win_area)
+                rects.append(self.win_area)
+            self.win_area = self.screen.blit(win_label, pos)
+            rects.append(self.win_area)
+        pygame.display.update(rects)
+        return rects
+
+
+if __name__ == '__main__':
+    g = GUI(1200, 700, 'random', 1, delay=1)
+    g.run()
@@ -1,5 +1,7 @@
 import math
-import random
+import queue
+import threading
+from functools import lru_cache
 
 import pygame
 from pygame.locals import *
@@ -47,6 +49,11 @@ class Board:
             Bank(1, 0.09 * self.size[0], (0.9 * self.size[0], 0.5 * self.size[1]), self.POSITION_COLOR_1, (self.font, self.FONT_COLOR)), 
             Bank(2, 0.09 * self.size[0], (0.1 * self.size[0], 0.5 * self.size[1]), self.POSITION_COLOR_2, (self.font, self.FONT_COLOR))
             ]
+
+        # Cached layers for render_cached() and redraw()
+        self.background = None
+        self.surface = None
+        self.areas = [None] * 14
     
 
     def render(self):
@@ -73,6 +80,67 @@ class Board:
                 pygame.draw.circle(board, self.PIECE_COLOR, piece.pos, piece.radius)
         return board
 
+    def position(self, index):
+        """
+        Returns the bowl or bank for an engine index, 0-11 are bowls, 12 and 13 are banks 1 and 2
+        """
+
+        if index < 12:
+            return self.bowls[index]
+        return self.banks[index - 12]
+
+    def render_background(self):
+        """
+        Returns the static layer: the board and the empty bowl and bank circles
+        """
+
+        background = pygame.Surface(self.size)
+        background.fill(self.BOARD_COLOR)
+        for bowl in self.bowls:
+            pygame.draw.circle(background, bowl.color, bowl.pos, bowl.radius)
+        for bank in self.banks:
+            pygame.draw.circle(background, bank.color, bank.pos, bank.radius)
+        return background
+
+    def render_cached(self):
+        """
+        Returns a persistent surface of the board state, drawing every position once
+        Later changes are drawn onto it with redraw()
+        """
+
+        if self.background is None:
+            self.background = self.render_background()
+        self.surface = self.background.copy()
+        self.redraw(range(14))
+        return self.surface
+
+    def redraw(self, indices):
+        """
+        Redraws only the given positions onto the cached surface
+        Returns the changed rects, relative to the board
+        """
+
+        if self.surface is None:
+            self.render_cached()
+            return [self.surface.get_rect()]
+        rects = []
+        for index in indices:
+            container = self.position(index)
+            label = container.label()
+            circle = pygame.Rect(0, 0, 2 * container.radius, 2 * container.radius)
+            circle.center = container.pos
+            area = circle.union(label[0].get_rect(topleft=label[1]))
+            # The previous label can be wider than the new one
+            if self.areas[index] is not None:
+                area = area.union(self.areas[index])
+            self.areas[index] = area
+            self.surface.blit(self.background, area, area)
+            self.surface.blit(label[0], label[1])
+            for piece in container.pieces:
+                pygame.draw.circle(self.surface, self.PIECE_COLOR, piece.pos, piece.radius)
+            rects.append(area)
+        return rects
+
 
 class Bowl:
 
@@ -86,23 +154,30 @@ class Bowl:
         self.color = color
         self.font = font[0]
         self.font_color = font[1]
+        self.label_cache = None
         self.add(self.value)
 
     def add(self, num):
-        for i in range(num):
-            p = Piece()
-            p.gen_pos(self.radius, self.pos, self.pieces)
-            self.pieces.append(p)
-            self.value = len(self.pieces)
+        layout = piece_layout(self.radius, len(self.pieces) + num)
+        for offset in layout[len(self.pieces):]:
+            self.pieces.append(Piece((self.pos[0] + offset[0], self.pos[1] + offset[1])))
+        self.value = len(self.pieces)
 
     def remove_all(self):
         self.pieces = []
         self.value = 0
 
+    def remove(self, num):
+        self.pieces = self.pieces[:max(0, len(self.pieces) - num)]
+        self.value = len(self.pieces)
+
     def label(self):
-        label = self.font.render(f'{self.value}', 1, self.font_color)
-        label_pos = (self.pos[0] - 0.5 * label.get_width(), self.pos[1] - 1.5 * self.radius - 0.5 * label.get_height())
-        return (label, label_pos)
+        # Text is only rendered again when the value changes
+        if self.label_cache is None or self.label_cache[0] != self.value:
+            label = self.font.render(f'{self.value}', 1, self.font_color)
+            label_pos = (self.pos[0] - 0.5 * label.get_width(), self.pos[1] - 1.5 * self.radius - 0.5 * label.get_height())
+            self.label_cache = (self.value, (label, label_pos))
+        return self.label_cache[1]
 
 
 class Bank:
@@ -116,22 +191,29 @@ class Bank:
         self.color = color
         self.font = font[0]
         self.font_color = font[1]
+        self.label_cache = None
 
     def add(self, num):
-        for i in range(num):
-            p = Piece()
-            p.gen_pos(self.radius, self.pos, self.pieces)
-            self.pieces.append(p)
-            self.value = len(self.pieces)
+        layout = piece_layout(self.radius, len(self.pieces) + num)
+        for offset in layout[len(self.pieces):]:
+            self.pieces.append(Piece((self.pos[0] + offset[0], self.pos[1] + offset[1])))
+        self.value = len(self.pieces)
 
     def remove_all(self):
         self.pieces = []
         self.value = 0
 
+    def remove(self, num):
+        self.pieces = self.pieces[:max(0, len(self.pieces) - num)]
+        self.value = len(self.pieces)
+
     def label(self):
-        label = self.font.render(f'{self.value}', 1, self.font_color)
-        label_pos = (self.pos[0] - 0.5 * label.get_width(), self.pos[1] - 1.2 * self.radius - 0.5 * label.get_height())
-        return (label, label_pos)
+        # Text is only rendered again when the value changes
+        if self.label_cache is None or self.label_cache[0] != self.value:
+            label = self.font.render(f'{self.value}', 1, self.font_color)
+            label_pos = (self.pos[0] - 0.5 * label.get_width(), self.pos[1] - 1.2 * self.radius - 0.5 * label.get_height())
+            self.label_cache = (self.value, (label, label_pos))
+        return self.label_cache[1]
 
 
 class Piece:
@@ -140,25 +222,74 @@ class Piece:
     def __init__(self, position=(0,0)):
         self.pos = position
 
-    def gen_pos(self, parent_radius, parent_position, other_pieces):
-        """
-        Generates a random position within the parent circle for the piece to be placed, collision free
-        Infinite loops if there are no valid positions
-        """
-        x = None
-        y = None
-        # Check for collisions
+
+class MoveWorker(threading.Thread):
+    """
+    Runs engine steps off the event thread, so bot and engine work never blocks rendering
+    Requests are choices, or None to let the engine pick the move for the current player
+    Results are (update, move) tuples, where update is what step() returned and move is the logged move, or None
+    If a step raises, the exception is put on the results queue in place of the update
+    """
+
+    STOP = object()
+
+    def __init__(self, game):
+        super().__init__(daemon=True)
+        self.game = game
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+
+    def run(self):
         while True:
-            r = (parent_radius - self.radius) * math.sqrt(random.random())
-            theta = random.random() * 2 * math.pi
-            x = parent_position[0] + r * math.cos(theta)
-            y = parent_position[1] + r * math.sin(theta)
-            collision = False
-            for p in other_pieces:
-                dist = math.hypot(x - p.pos[0], y - p.pos[1])
-                if dist < 2 * self.radius:
-                    collision = True
-                    break
-            if not collision:
+            choice = self.requests.get()
+            if choice is self.STOP:
                 break
-        self.pos = (x, y)
+            try:
+                num_moves = len(self.game.moves)
+                update = self.game.step(choice)
+                move = self.game.moves[-1] if len(self.game.moves) > num_moves else None
+                self.results.put((update, move))
+            except Exception as e:
+                self.results.put((e, None))
+
+    def stop(self):
+        self.requests.put(self.STOP)
+
+
+@lru_cache(maxsize=None)
+def piece_slots(parent_radius, piece_radius=Piece.radius):
+    """
+    Returns collision free piece offsets for a circle, packed in rings from the center outward
+    Any prefix of the slots is a valid layout, so adding pieces never moves the ones already placed
+    """
+
+    slots = [(0.0, 0.0)]
+    ring = 1
+    while ring * 2 * piece_radius <= parent_radius - piece_radius:
+        dist = ring * 2 * piece_radius
+        count = int(math.pi / math.asin(piece_radius / dist))
+        # Stagger each ring so neighbouring rings don't line up
+        start = ring * 0.5
+        for i in range(count):
+            theta = start + 2 * math.pi * i / count
+            slots.append((dist * math.cos(theta), dist * math.sin(theta)))
+        ring += 1
+    return tuple(slots)
+
+
+@lru_cache(maxsize=1024)
+def piece_layout(parent_radius, count, piece_radius=Piece.radius):
+    """
+    Returns offsets for count pieces in a circle of parent_radius
+    If there are more pieces than slots, the extra pieces are stacked over the first ones, pulled slightly toward the center
+    so they stay inside the circle. Placement always finishes in time proportional to count
+    """
+
+    slots = piece_slots(parent_radius, piece_radius)
+    layout = list(slots[:count])
+    for i in range(len(slots), count):
+        layer = i // len(slots)
+        x, y = slots[i % len(slots)]
+        scale = 1 - 0.15 * ((layer - 1) % 3 + 1)
+        layout.append((x * scale, y * scale))
+    return tuple(layout)
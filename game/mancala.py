@@ -1,7 +1,7 @@
 import json
 import random
 
-from mancala_helpers import Position, Board
+from mancala_helpers import make_board, next_player
 
 """
 Class to simulate Mancala games
@@ -37,15 +37,23 @@ GUI:
     True: Runs the game in the GUI
     False: Runs the game in the console
 
+Bot:
+    Any object with get_move(board, player), such as MancalaBot
+    In 'bot' mode the bot plays player 2, in 'bot_vs_random_training' it plays player 1
+Book:
+    Optional OpeningBook, checked before asking the bot for a move
+
 """
 class MancalaGame:
 
-    def __init__(self, starting_player=1, num_games=1, mode='default', gui=False, tickrate=0):
+    def __init__(self, starting_player=1, num_games=1, mode='default', gui=False, tickrate=0, bot=None, book=None):
         self.starting_player = starting_player
         self.num_games = num_games
         self.mode = mode
         self.gui = gui
         self.tickrate = tickrate
+        self.bot = bot
+        self.book = book
         self.storage = []
         self.board = None
 
@@ -86,17 +94,7 @@ class MancalaGame:
         self.player = starting_player
         
         # Create board
-        self.board = Board()
-        for i in range(0,6):
-            self.board.add(Position(i, 'bowl', 4, 1, None))
-        for i in range(6,12):
-            self.board.add(Position(i, 'bowl', 4, 2, None))
-        for i, p in enumerate(self.board.positions[:11]):
-            p.next = self.board[i + 1]
-        self.board.add(Position(12, 'store', 0, 1, self.board[6]))
-        self.board.add(Position(13, 'store', 0, 2, self.board[0]))
-        self.board[5].next = self.board[12]
-        self.board[11].next = self.board[13]
+        self.board = make_board([4] * 12, 0, 0)
 
 
     def step(self, move=None):
@@ -134,35 +132,19 @@ class MancalaGame:
             move = self.make_move(self.player, move)
         self.moves.append(move)
         # Switch player, or don't switch if player got a refresh
-        if move[2] == False:
-            if self.player == 1:
-                self.player = 2
-            elif self.player == 2:
-                self.player = 1
+        self.player = next_player(self.player, move[1])
 
         # Check for a win
         # Note - It's possible a game can be over before this check passes.
         # Ending the game at the exact point it's impossible for a player to win requires a much more robust check
         # May implement it, but it doesn't seem worth extra computation or time
-        num_remaining = self.board.sum()
-        if self.board.bank1().value - self.board.bank2().value > num_remaining:
-            winner = self.end_game()
-            return (True, winner, move[3], move[4])
-        elif self.board.bank2().value - self.board.bank1().value  > num_remaining:
+        if self.board.decided():
             winner = self.end_game()
             return (True, winner, move[3], move[4])
         
         # If the next player has no options, end the game
         if not self.get_options():
-            winnings = self.board.sum()
-            additions = [0] * 14
-            if self.player == 1:
-                self.board[13].value = self.board[13].value + winnings
-                additions[13] = winnings
-            elif self.player == 2:
-                self.board[12].value = self.board[12].value + winnings
-                additions[12] = winnings
-            removals = self.board.clear_bowls()
+            additions, removals = self.board.sweep(self.player)
             winner = self.end_game()
             for i in range(14):
                 additions[i] += move[3][i]
@@ -181,12 +163,13 @@ class MancalaGame:
 
         # Make choice
         choice = None
-        if ((self.mode == 'default') or (self.mode == 'random' and player == 1)) and not self.gui:
+        manual = (self.mode == 'default') or (self.mode in ['random', 'bot'] and player == 1)
+        if manual and not self.gui:
             options = self.get_options()
             self.display_board_console(player, options)
             while(choice not in options):
                 choice = int(input())
-        elif ((self.mode == 'default') or (self.mode == 'random' and player == 1)) and self.gui and move != None:
+        elif manual and self.gui and move != None:
             choice = move
         elif self.mode == 'random' and player == 2:
             choice = random.choice([i + 6 for i, b in enumerate(self.board.bowls2()) if b.value != 0])
@@ -195,62 +178,36 @@ class MancalaGame:
                 choice = random.choice([i for i, b in enumerate(self.board.bowls1()) if b.value != 0])
             elif player == 2:
                 choice = random.choice([i + 6 for i, b in enumerate(self.board.bowls2()) if b.value != 0])
+        elif self.mode == 'bot_vs_random_training' and player == 2:
+            choice = random.choice(self.get_options())
+        elif self.mode in ['bot', 'bot_vs_bot', 'bot_vs_random_training', 'bot_vs_bot_training'] and self.bot:
+            choice = self.bot_move(player)
         else:
             raise Exception('make_move: Invalid move or mode: ' + str(self.mode) + ' Player ' + str(player) + ' move: ' + str(move))
 
         # Execute move
-        additions = [0] * 14
-        removals = [0] * 14
-
-        curr = self.board[choice]
-        amount = curr.value
-        curr.value = 0
-        removals[curr.index] += 1
-        curr = curr.next
-        
-        refresh = False
-        capture = False
-        final_position = None
-        count = 0
-        while count < amount:
-            if curr.index == self.board.bank1().index and player != 1:
-                curr = curr.next
-            elif curr.index == self.board.bank2().index and player != 2:
-                curr = curr.next
-            else:
-                final_position = curr
-                curr.increment()
-                additions[curr.index] += 1
-                curr = curr.next
-                count += 1
-        
-        # Check for capture or turn refresh on the final position
-        # Refresh if player ended in their own store
-        # Capture if player ended in their own empty bowl adjacent to a non-empty enemy bowl
-        if final_position.owner == player and final_position.type == 'store':
-            refresh = True
-            if self.mode == 'default' and not self.gui:
-                print('Refresh!')
-        elif final_position.owner == player and final_position.value == 1 and final_position.type == 'bowl':
-            amount_won = self.board[11 - final_position.index].value + 1
-            if amount_won > 1:
-                capture = True
-                if self.mode == 'default' and not self.gui:
-                    print(f'Captured {amount_won} pieces!')
-                self.board[11 - final_position.index] = 0
-                self.board[final_position.index] = 0
-                removals[11 - final_position.index] += 1
-                removals[final_position.index] += 1
-                if player == 1:
-                    self.board[self.board.bank1().index].value += amount_won
-                    additions[self.board.bank1().index] += amount_won
-                elif player == 2:
-                    self.board[self.board.bank2().index].value += amount_won
-                    additions[self.board.bank2().index] += amount_won
+        refresh, captured, additions, removals = self.board.sow(choice, player)
+        capture = captured > 0
+        if refresh and self.mode == 'default' and not self.gui:
+            print('Refresh!')
+        elif capture and self.mode == 'default' and not self.gui:
+            print(f'Captured {captured} pieces!')
 
         return (choice, refresh, capture, additions, removals, player)
     
 
+    def bot_move(self, player):
+        """
+        Returns the opening book move if the position is in the book, otherwise the bot's move
+        """
+
+        if self.book:
+            choice = self.book.lookup(self.board, player)
+            if choice is not None:
+                return choice
+        return self.bot.get_move(self.board, player)
+
+
     def end_game(self):
         """
         Handles a game finish.
@@ -265,7 +222,7 @@ class MancalaGame:
 
         if self.mode == 'default' and not self.gui:
             print(f'Player {winner} won!')
-        elif self.mode == 'random_training':
+        elif self.mode in ['random_training', 'bot_vs_random_training', 'bot_vs_bot_training']:
             print(f'Game {len(self.storage)} complete. Winner: Player {winner}')
 
         final_moves = []
@@ -298,12 +255,7 @@ class MancalaGame:
         Returns the current player's valid options for moves
         """
 
-        options = None
-        if self.player == 1:
-            options = [i for i, b in enumerate(self.board.bowls1()) if b.value != 0]
-        elif self.player == 2:
-            options = [i + 6 for i, b in enumerate(self.board.bowls2()) if b.value != 0]
-        return options
+        return self.board.options(self.player)
     
 
     def get_log(self, filename='mancala_data_raw.json'):
@@ -60,3 +60,145 @@ class Board:
     
     def bowls2(self):
         return self.positions[6:12]
+
+    # Returns the bowls player can move from
+    def options(self, player):
+        if player == 1:
+            return [i for i, b in enumerate(self.bowls1()) if b.value != 0]
+        elif player == 2:
+            return [i + 6 for i, b in enumerate(self.bowls2()) if b.value != 0]
+        return None
+
+    # Returns an independent board with the same values and links
+    def copy(self):
+        board = Board()
+        for pos in self.positions:
+            board.add(Position(pos.index, pos.type, pos.value, pos.owner, None))
+        for pos, new in zip(self.positions, board.positions):
+            new.next = board[pos.next.index]
+        return board
+
+    # True if either bank leads by more than the pieces left in play
+    def decided(self):
+        remaining = self.sum()
+        return abs(self.bank1().value - self.bank2().value) > remaining
+
+    # Ends the game when player has no options: the pieces left go to the other player's bank
+    # Returns (additions, removals)
+    def sweep(self, player):
+        winnings = self.sum()
+        additions = [0] * 14
+        if player == 1:
+            self.bank2().value += winnings
+            additions[13] = winnings
+        elif player == 2:
+            self.bank1().value += winnings
+            additions[12] = winnings
+        removals = self.clear_bowls()
+        return (additions, removals)
+
+    # Applies the end of game rules after a move, with player to move next
+    # Returns whether the game is over, sweeping the board if player has no options
+    def finished(self, player):
+        if self.decided():
+            return True
+        if not self.options(player):
+            self.sweep(player)
+            return True
+        return False
+
+    # Executes a move for player, returns (refresh, pieces captured, additions, removals)
+    def sow(self, choice, player):
+        additions = [0] * 14
+        removals = [0] * 14
+
+        curr = self.positions[choice]
+        amount = curr.value
+        curr.value = 0
+        removals[curr.index] += 1
+        curr = curr.next
+
+        final_position = None
+        count = 0
+        while count < amount:
+            if curr.index == self.bank1().index and player != 1:
+                curr = curr.next
+            elif curr.index == self.bank2().index and player != 2:
+                curr = curr.next
+            else:
+                final_position = curr
+                curr.increment()
+                additions[curr.index] += 1
+                curr = curr.next
+                count += 1
+
+        # Refresh if player ended in their own store
+        # Capture if player ended in their own empty bowl adjacent to a non-empty enemy bowl
+        refresh = False
+        captured = 0
+        if final_position.owner == player and final_position.type == 'store':
+            refresh = True
+        elif final_position.owner == player and final_position.value == 1 and final_position.type == 'bowl':
+            amount_won = self.positions[11 - final_position.index].value + 1
+            if amount_won > 1:
+                captured = amount_won
+                self[11 - final_position.index] = 0
+                self[final_position.index] = 0
+                removals[11 - final_position.index] += 1
+                removals[final_position.index] += 1
+                bank = self.bank1() if player == 1 else self.bank2()
+                bank.value += amount_won
+                additions[bank.index] += amount_won
+        return (refresh, captured, additions, removals)
+
+
+# Builds a linked board from bowl and bank values
+def make_board(bowls, bank1, bank2):
+    board = Board()
+    for i in range(0,6):
+        board.add(Position(i, 'bowl', bowls[i], 1, None))
+    for i in range(6,12):
+        board.add(Position(i, 'bowl', bowls[i], 2, None))
+    for i, p in enumerate(board.positions[:11]):
+        p.next = board[i + 1]
+    board.add(Position(12, 'store', bank1, 1, board[6]))
+    board.add(Position(13, 'store', bank2, 2, board[0]))
+    board[5].next = board[12]
+    board[11].next = board[13]
+    return board
+
+# Returns whose turn it is after player moves, a refresh gives the same player another turn
+def next_player(player, refresh):
+    if refresh:
+        return player
+    return 2 if player == 1 else 1
+
+
+# Symmetry between the two sides of the board
+# Rotating every bowl by 6 and swapping the banks maps player 2's view onto player 1's,
+# with sowing order and opposite bowls preserved. The rotation is its own inverse.
+
+# Returns (bowls, bank1, bank2) seen from the side to move, so the mover always owns bowls 0-5 and bank 1
+def canonical_state(bowls, bank1, bank2, player):
+    if player == 2:
+        return (list(bowls[6:12]) + list(bowls[0:6]), bank2, bank1)
+    return (list(bowls), bank1, bank2)
+
+# Inverse of canonical_state
+def uncanonical_state(bowls, bank1, bank2, player):
+    return canonical_state(bowls, bank1, bank2, player)
+
+# Maps a bowl index chosen by player into the canonical view
+def canonical_move(choice, player):
+    if player == 2:
+        return (choice + 6) % 12
+    return choice
+
+# Inverse of canonical_move
+def uncanonical_move(choice, player):
+    return canonical_move(choice, player)
+
+# Packs a canonical position into a short hashable key
+def position_key(bowls, bank1, bank2, player):
+    bowls, bank1, bank2 = canonical_state(bowls, bank1, bank2, player)
+    return bytes(bowls + [bank1, bank2])
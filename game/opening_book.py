@@ -0,0 +1,130 @@
+import struct
+from multiprocessing import Pool
+
+from mancala_helpers import make_board, next_player, position_key, canonical_move, uncanonical_move
+from search import best_move
+
+"""
+Precomputed opening book
+
+Every game starts from 4 pieces per bowl, so the first few plies are always the same positions.
+The book searches every position reachable in the first PLIES plies offline, in parallel,
+and stores the best move and score for each one.
+
+Positions are stored in canonical form (see position_key), so one entry serves both players.
+Each record is the 14 byte position key, the canonical move and the score.
+
+Usage:
+    book = OpeningBook('mancala_opening_book.bin')
+    choice = book.lookup(board, player)  # None if the position is not in the book
+"""
+
+PLIES = 6
+DEPTH = 10
+BOOK_FILE = 'mancala_opening_book.bin'
+
+
+class OpeningBook:
+    RECORD = struct.Struct('14sBh')
+
+    def __init__(self, file_name=None):
+        # Without a file the book starts empty, for build(). A missing file raises FileNotFoundError
+        self.entries = {}
+        if file_name is not None:
+            self.load(file_name)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, key, move, score):
+        self.entries[key] = (move, score)
+
+    def lookup(self, board, player):
+        """
+        Returns the book move for player on the board, or None if the position is not in the book
+        """
+
+        entry = self.entries.get(position_key(board.flatten(), board.bank1().value, board.bank2().value, player))
+        if entry is None:
+            return None
+        return uncanonical_move(entry[0], player)
+
+    def score(self, board, player):
+        """
+        Returns the searched score of the position for player, or None if the position is not in the book
+        """
+
+        entry = self.entries.get(position_key(board.flatten(), board.bank1().value, board.bank2().value, player))
+        if entry is None:
+            return None
+        return entry[1]
+
+    def load(self, file_name=BOOK_FILE):
+        with open(file_name, 'rb') as file:
+            data = file.read()
+        for key, move, score in self.RECORD.iter_unpack(data):
+            self.entries[key] = (move, score)
+
+    def save(self, file_name=BOOK_FILE):
+        with open(file_name, 'wb') as file:
+            for key, (move, score) in self.entries.items():
+                file.write(self.RECORD.pack(key, move, score))
+
+
+def openings(plies):
+    """
+    Returns the canonical keys of every undecided position reachable in the given number of plies
+    Each key is for player 1 to move
+    """
+
+    frontier = {position_key([4] * 12, 0, 0, 1)}
+    seen = set(frontier)
+    for ply in range(plies - 1):
+        following_frontier = set()
+        for key in frontier:
+            board = make_board(list(key[:12]), key[12], key[13])
+            for choice in board.options(1):
+                child = board.copy()
+                refresh = child.sow(choice, 1)[0]
+                following = next_player(1, refresh)
+                if child.decided() or not child.options(following):
+                    continue
+                child_key = position_key(child.flatten(), child.bank1().value, child.bank2().value, following)
+                if child_key not in seen:
+                    seen.add(child_key)
+                    following_frontier.add(child_key)
+        frontier = following_frontier
+    return sorted(seen)
+
+
+def search_position(args):
+    """
+    Worker for build(): searches one canonical position, returns (key, canonical move, score)
+    """
+
+    key, depth = args
+    board = make_board(list(key[:12]), key[12], key[13])
+    choice, score = best_move(board, 1, depth)
+    return (key, canonical_move(choice, 1), score)
+
+
+def build(plies=PLIES, depth=DEPTH, processes=None):
+    """
+    Searches every opening position and returns the filled book
+    """
+
+    keys = openings(plies)
+    print(f'Searching {len(keys)} opening positions at depth {depth}')
+    book = OpeningBook()
+    with Pool(processes) as pool:
+        for i, (key, move, score) in enumerate(pool.imap_unordered(search_position, [(key, depth) for key in keys], chunksize=8)):
+            book.add(key, move, score)
+            if (i + 1) % 100 == 0:
+                print(f'{i + 1}/{len(keys)} positions searched')
+    return book
+
+
+if __name__ == '__main__':
+    book = build()
+    book.save()
+    print(f'Saved {len(book)} positions to {BOOK_FILE}')
@@ -0,0 +1,116 @@
+import re
+import json
+from collections import OrderedDict
+
+from mancala_helpers import make_board
+
+"""
+Lazy access to recorded game logs for replays
+
+ReplayLog opens a get_log() file on first use and indexes where each game starts in the text,
+so a game is only decoded when it is asked for.
+ReplayGame keeps a keyframe board every keyframe_interval plies and drops the rest of the logged states.
+Any ply is rebuilt from the nearest keyframe with at most keyframe_interval - 1 moves.
+"""
+
+class ReplayLog:
+    # get_log() writes each game as "gameN": {"id": ...
+    GAME_PATTERN = re.compile(r'"game(\d+)": \{"id"')
+
+    def __init__(self, file_name='mancala_data_raw.json', keyframe_interval=16, cache_size=8):
+        self.file_name = file_name
+        self.keyframe_interval = keyframe_interval
+        self.cache_size = cache_size
+        self.text = None
+        self.offsets = None
+        self.games = OrderedDict()
+        self.decoder = json.JSONDecoder()
+
+    def open(self):
+        """
+        Reads the log and indexes the start of every game, only done on first use
+        """
+
+        if self.offsets is not None:
+            return
+        with open(self.file_name) as file:
+            self.text = file.read()
+        self.offsets = {}
+        for match in self.GAME_PATTERN.finditer(self.text):
+            # Skip past '"gameN": ' to the opening brace
+            self.offsets[int(match.group(1))] = match.start() + len(match.group(0)) - len('{"id"')
+
+    def __len__(self):
+        self.open()
+        return len(self.offsets)
+
+    def game(self, index):
+        """
+        Returns the ReplayGame for a game, decoding it if it isn't one of the recently used games
+        """
+
+        self.open()
+        if index in self.games:
+            self.games.move_to_end(index)
+            return self.games[index]
+        data, end = self.decoder.raw_decode(self.text, self.offsets[index])
+        game = ReplayGame(data, self.keyframe_interval)
+        self.games[index] = game
+        if len(self.games) > self.cache_size:
+            self.games.popitem(last=False)
+        return game
+
+
+class ReplayGame:
+
+    def __init__(self, data, keyframe_interval=16):
+        self.id = data['id']
+        self.winner = data['winner']
+        self.moves = data['moves']
+        self.length = len(self.moves)
+        self.keyframe_interval = keyframe_interval
+
+        # Keyframes are (values of the 14 positions, player to move), taken from the logged states
+        self.keyframes = []
+        for ply in range(0, self.length, keyframe_interval):
+            state = data['states'][ply]
+            self.keyframes.append((state['board'] + [state['bank1'], state['bank2']], state['player']))
+        if self.length % keyframe_interval == 0:
+            self.keyframes.append((self.replay(self.length), None))
+
+    def player(self, ply):
+        """
+        Returns the player to move at ply, None once the game is over
+        """
+
+        if ply < self.length:
+            return self.moves[ply]['player']
+        return None
+
+    def replay(self, ply):
+        """
+        Returns the position values at ply, playing the moves since the nearest keyframe
+        """
+
+        start = min(ply // self.keyframe_interval, len(self.keyframes) - 1)
+        values = self.keyframes[start][0]
+        board = make_board(values[:12], values[12], values[13])
+        for move in self.moves[start * self.keyframe_interval:ply]:
+            board.sow(move['choice'], move['player'])
+        if ply == self.length and board.sum() > 0 and not board.decided():
+            # The game ended with one side empty, the other side's pieces went to its owner's bank
+            if sum(b.value for b in board.bowls1()) == 0:
+                board.sweep(1)
+            elif sum(b.value for b in board.bowls2()) == 0:
+                board.sweep(2)
+        return [p.value for p in board.positions]
+
+    def position(self, ply):
+        """
+        Returns (values of the 14 positions, player to move) at ply, 0 <= ply <= length
+        """
+
+        ply = max(0, min(ply, self.length))
+        if ply % self.keyframe_interval == 0 and ply // self.keyframe_interval < len(self.keyframes):
+            return self.keyframes[ply // self.keyframe_interval]
+        return (self.replay(ply), self.player(ply))
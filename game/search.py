@@ -0,0 +1,100 @@
+from mancala_helpers import next_player, position_key
+
+"""
+Game tree search for the mancala engine
+
+Negamax with alpha-beta pruning over copies of the board.
+Scores are bank differences from the view of the player to move.
+Positions are stored in the transposition table by their canonical key,
+so a position and its mirror for the other player share an entry.
+"""
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+def evaluate(board, player):
+    """
+    Returns the bank difference from player's view
+    """
+
+    if player == 1:
+        return board.bank1().value - board.bank2().value
+    return board.bank2().value - board.bank1().value
+
+
+def negamax(board, player, depth, alpha, beta, table):
+    """
+    Returns the score of the position for player to move, searched depth plies deep
+    The board is not modified
+    """
+
+    key = position_key(board.flatten(), board.bank1().value, board.bank2().value, player)
+    entry = table.get(key)
+    if entry is not None and entry[0] >= depth:
+        if entry[2] == EXACT:
+            return entry[1]
+        elif entry[2] == LOWER:
+            alpha = max(alpha, entry[1])
+        elif entry[2] == UPPER:
+            beta = min(beta, entry[1])
+        if alpha >= beta:
+            return entry[1]
+
+    options = board.options(player)
+    if depth <= 0 or not options:
+        return evaluate(board, player)
+
+    original_alpha = alpha
+    best = None
+    for choice in options:
+        score = score_move(board, player, choice, depth, alpha, beta, table)
+        if best is None or score > best:
+            best = score
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            break
+
+    flag = EXACT
+    if best <= original_alpha:
+        flag = UPPER
+    elif best >= beta:
+        flag = LOWER
+    table[key] = (depth, best, flag)
+    return best
+
+
+def score_move(board, player, choice, depth, alpha, beta, table):
+    """
+    Plays choice on a copy of the board and returns the score from player's view
+    A refresh keeps the turn, so the search continues for the same player
+    """
+
+    child = board.copy()
+    refresh = child.sow(choice, player)[0]
+    following = next_player(player, refresh)
+
+    if child.finished(following):
+        return evaluate(child, player)
+
+    if following == player:
+        return negamax(child, player, depth - 1, alpha, beta, table)
+    return -negamax(child, following, depth - 1, -beta, -alpha, table)
+
+
+def best_move(board, player, depth, table=None):
+    """
+    Searches each of player's options and returns (best choice, score)
+    """
+
+    if table is None:
+        table = {}
+    best = None
+    alpha = -float('inf')
+    for choice in board.options(player):
+        score = score_move(board, player, choice, depth, alpha, float('inf'), table)
+        if best is None or score > best[1]:
+            best = (choice, score)
+        alpha = max(alpha, score)
+    return best
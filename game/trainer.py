@@ -9,7 +9,7 @@ Outputs a log of games to './mancala_data_raw.json'
 NUM_GAMES = 10000
 TRAINING_MODE = 'random_training'
 
-game = MancalaGame(1, NUM_GAMES, TRAINING_MODE)
-
-game.gen_data()
-game.get_log()
\ No newline at end of file
+if __name__ == '__main__':
+    game = MancalaGame(1, NUM_GAMES, TRAINING_MODE)
+    game.gen_data()
+    game.get_log()